@@ -9,9 +9,16 @@ import re
 import json
 from pathlib import Path
 
+try:
+    from ..data_access import dataset_exists, load_dataset  # imported as backend.chatbot
+except ImportError:
+    from data_access import dataset_exists, load_dataset  # backend directory on sys.path
+
 class SupplierDiversityChatbot:
     """Main chatbot engine for supplier diversity questions"""
     
+    KNOWLEDGE_DATASETS = ['test_results', 'detailed_analysis', 'small_businesses']
+    
     def __init__(self):
         self.is_ai_enabled = True
         self.backend_dir = Path(__file__).parent.parent
@@ -21,20 +28,10 @@ class SupplierDiversityChatbot:
         """Load procurement data for context"""
         knowledge = {}
         try:
-            # Load test results for supplier matching context
-            test_results_path = self.backend_dir / "test_results.csv"
-            if test_results_path.exists():
-                knowledge['test_results'] = pd.read_csv(test_results_path)
-            
-            # Load detailed analysis
-            detailed_path = self.backend_dir / "detailed_similarity_analysis.csv"
-            if detailed_path.exists():
-                knowledge['detailed_analysis'] = pd.read_csv(detailed_path)
-                
-            # Load small businesses data
-            small_biz_path = self.backend_dir / "sample_small_businesses.csv"
-            if small_biz_path.exists():
-                knowledge['small_businesses'] = pd.read_csv(small_biz_path)
+            # Shared cached frames (read-only): test results, detailed analysis, small businesses
+            for name in self.KNOWLEDGE_DATASETS:
+                if dataset_exists(name, self.backend_dir):
+                    knowledge[name] = load_dataset(name, self.backend_dir)
                 
         except Exception as e:
             print(f"Warning: Could not load knowledge base: {e}")
@@ -15,11 +15,18 @@ from .aws_bedrock_engine import AWSBedrockEngine
 from .data_analyzer import ProcurementDataAnalyzer
 from .response_generator import ResponseGenerator
 
+try:
+    from ..data_access import dataset_exists, load_dataset  # imported as backend.chatbot
+except ImportError:
+    from data_access import dataset_exists, load_dataset  # backend directory on sys.path
+
 logger = logging.getLogger(__name__)
 
 class ClaudeSupplierDiversityChatbot:
     """Claude-powered chatbot engine for supplier diversity questions"""
     
+    KNOWLEDGE_DATASETS = ['test_results', 'detailed_analysis', 'small_businesses']
+    
     def __init__(self):
         """Initialize the Claude chatbot with AWS Bedrock integration"""
         self.backend_dir = Path(__file__).parent.parent
@@ -44,20 +51,10 @@ class ClaudeSupplierDiversityChatbot:
         """Load procurement data for context"""
         knowledge = {}
         try:
-            # Load test results for supplier matching context
-            test_results_path = self.backend_dir / "test_results.csv"
-            if test_results_path.exists():
-                knowledge['test_results'] = pd.read_csv(test_results_path)
-            
-            # Load detailed analysis
-            detailed_path = self.backend_dir / "detailed_similarity_analysis.csv"
-            if detailed_path.exists():
-                knowledge['detailed_analysis'] = pd.read_csv(detailed_path)
-                
-            # Load small businesses data
-            small_biz_path = self.backend_dir / "sample_small_businesses.csv"
-            if small_biz_path.exists():
-                knowledge['small_businesses'] = pd.read_csv(small_biz_path)
+            # Shared cached frames (read-only): test results, detailed analysis, small businesses
+            for name in self.KNOWLEDGE_DATASETS:
+                if dataset_exists(name, self.backend_dir):
+                    knowledge[name] = load_dataset(name, self.backend_dir)
                 
         except Exception as e:
             logger.warning(f"Could not load knowledge base: {e}")
@@ -203,6 +200,9 @@ class ClaudeSupplierDiversityChatbot:
         }
         
         try:
+            # Pick up data files changed since the last build (unchanged files stay cached)
+            self.knowledge_base = self._load_knowledge_base()
+            
             # Try to extract from test results
             if 'test_results' in self.knowledge_base:
                 df = self.knowledge_base['test_results']
@@ -210,9 +210,9 @@ class ClaudeSupplierDiversityChatbot:
                     # Calculate basic metrics
                     context['total_pos'] = len(df)
                     
-                    # Estimate current small business percentage
-                    if 'is_small_business' in df.columns:
-                        current_sb = df['is_small_business'].sum()
+                    # Current small business POs, flagged once when the data was loaded
+                    if 'IsCurrentSmallBusiness' in df.columns:
+                        current_sb = int(df['IsCurrentSmallBusiness'].sum())
                         context['current_small_business_pos'] = current_sb
                         context['current_percentage'] = (current_sb / len(df)) * 100
                         
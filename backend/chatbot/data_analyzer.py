@@ -7,40 +7,35 @@ import numpy as np
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 
+try:
+    from ..data_access import dataset_exists, load_dataset  # imported as backend.chatbot
+except ImportError:
+    from data_access import dataset_exists, load_dataset  # backend directory on sys.path
+
 class ProcurementDataAnalyzer:
     """Analyzes procurement data for chatbot insights"""
     
+    DATASETS = ['test_results', 'detailed_analysis', 'small_businesses', 'category_analysis']
+    
     def __init__(self):
         self.backend_dir = Path(__file__).parent.parent
         self.data_cache = {}
         self._load_data()
     
     def _load_data(self):
-        """Load all available data files"""
+        """Load all available data files from the shared dataset cache"""
         try:
-            # Load test results
-            test_results_path = self.backend_dir / "test_results.csv"
-            if test_results_path.exists():
-                self.data_cache['test_results'] = pd.read_csv(test_results_path)
-            
-            # Load detailed analysis
-            detailed_path = self.backend_dir / "detailed_similarity_analysis.csv"
-            if detailed_path.exists():
-                self.data_cache['detailed_analysis'] = pd.read_csv(detailed_path)
-            
-            # Load small businesses
-            small_biz_path = self.backend_dir / "sample_small_businesses.csv"
-            if small_biz_path.exists():
-                self.data_cache['small_businesses'] = pd.read_csv(small_biz_path)
-                
-            # Load category analysis
-            category_path = self.backend_dir / "category_analysis.csv"
-            if category_path.exists():
-                self.data_cache['category_analysis'] = pd.read_csv(category_path)
-                
+            self.data_cache = {
+                name: load_dataset(name, self.backend_dir)
+                for name in self.DATASETS if dataset_exists(name, self.backend_dir)
+            }
         except Exception as e:
             print(f"Warning: Could not load some data files: {e}")
     
+    def refresh(self):
+        """Pick up data files changed since the last load (unchanged files stay cached)"""
+        self._load_data()
+    
     def get_current_stats(self) -> Dict[str, Any]:
         """Get current procurement statistics"""
         if 'test_results' not in self.data_cache:
@@ -50,7 +45,7 @@ class ProcurementDataAnalyzer:
         
         # Calculate basic stats
         total_pos = len(df)
-        current_small_business_pos = len(df[df['is_small_business'] == True])
+        current_small_business_pos = int(df['IsCurrentSmallBusiness'].sum())
         current_percentage = (current_small_business_pos / total_pos) * 100 if total_pos > 0 else 0
         
         # Calculate gap to 25%
@@ -217,6 +212,7 @@ class ProcurementDataAnalyzer:
     
     def analyze_user_query(self, query: str) -> Dict[str, Any]:
         """Analyze user query and return relevant data context"""
+        self.refresh()
         query_lower = query.lower()
         context = {}
         
@@ -0,0 +1,113 @@
+"""
+Process-wide cache of the analysis datasets shared by the dashboard analytics and the chatbot
+
+Each CSV is parsed once into a typed DataFrame and reused until the file's
+mtime or size changes. Returned frames are shared between all callers and
+must be treated as read-only (derive new frames with assign/copy instead).
+"""
+
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import pandas as pd
+
+try:
+    from .matching.small_business import flag_small_business  # imported as backend.data_access
+except ImportError:
+    from matching.small_business import flag_small_business  # backend directory on sys.path
+
+DATA_DIR = Path(__file__).parent
+
+# name -> (file in the data directory, numeric columns coerced at load)
+DATASETS = {
+    'test_results': ('test_results.csv', ['PurchaseAmount', 'SimilarityScore']),
+    'detailed_analysis': ('detailed_similarity_analysis.csv',
+                          ['Match_Rank', 'Purchase_Amount', 'Similarity_Score', 'Overlap_Count',
+                           'Jaccard_Similarity']),
+    'small_business_contacts': ('small_business_contacts.csv', []),
+    'small_businesses': ('sample_small_businesses.csv', []),
+    'category_analysis': ('category_analysis.csv', [])
+}
+
+# name -> date columns parsed at load (unparseable values become NaT)
+DATE_COLUMNS = {
+    'test_results': ['OrderDate', 'Timestamp']
+}
+
+PathLike = Union[str, Path]
+
+_cache: Dict[Path, Tuple[int, int, pd.DataFrame]] = {}
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def add_small_business_flag(frame: pd.DataFrame) -> pd.DataFrame:
+    """IsCurrentSmallBusiness from CurrentSupplierType, unless the file already carries it"""
+    if 'IsCurrentSmallBusiness' in frame.columns:
+        frame['IsCurrentSmallBusiness'] = frame['IsCurrentSmallBusiness'].fillna(False).astype(bool)
+    elif 'CurrentSupplierType' in frame.columns:
+        frame['IsCurrentSmallBusiness'] = flag_small_business(frame['CurrentSupplierType'])
+    return frame
+
+
+# Columns derived once per file version, so callers read them instead of recomputing
+DERIVED_COLUMNS = {
+    'test_results': add_small_business_flag
+}
+
+
+def _read(path: Path, numeric_columns, date_columns=()) -> pd.DataFrame:
+    """Parse one CSV with its numeric and date columns typed"""
+    frame = pd.read_csv(path)
+    for col in numeric_columns:
+        if col in frame.columns:
+            frame[col] = pd.to_numeric(frame[col], errors='coerce')
+    for col in date_columns:
+        if col in frame.columns:
+            frame[col] = pd.to_datetime(frame[col], errors='coerce', format='ISO8601')
+    return frame
+
+
+def dataset_path(name: str, data_dir: Optional[PathLike] = None) -> Path:
+    """Location of a named dataset"""
+    if name not in DATASETS:
+        raise ValueError(f"Unknown dataset: {name}")
+    return Path(data_dir or DATA_DIR) / DATASETS[name][0]
+
+
+def load_dataset(name: str, data_dir: Optional[PathLike] = None) -> pd.DataFrame:
+    """Cached typed frame of a named dataset; an empty frame when the file does not exist"""
+    path = dataset_path(name, data_dir)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return pd.DataFrame()
+
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            _stats['hits'] += 1
+            return cached[2]
+        _stats['misses'] += 1
+        frame = _read(path, DATASETS[name][1], DATE_COLUMNS.get(name, ()))
+        if name in DERIVED_COLUMNS:
+            frame = DERIVED_COLUMNS[name](frame)
+        _cache[path] = (stat.st_mtime_ns, stat.st_size, frame)
+        return frame
+
+
+def dataset_exists(name: str, data_dir: Optional[PathLike] = None) -> bool:
+    return dataset_path(name, data_dir).exists()
+
+
+def clear_cache():
+    """Drop every cached frame"""
+    with _lock:
+        _cache.clear()
+
+
+def cache_info() -> Dict:
+    """Hit/miss counters and the cached files"""
+    with _lock:
+        return dict(_stats, cached=[str(path) for path in _cache])
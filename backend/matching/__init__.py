@@ -0,0 +1,25 @@
+"""
+Matching support package for the supplier similarity matcher
+"""
+
+from .bm25 import BM25Scorer
+from .blocking import plan_blocks, score_blocked
+from .categories import CategoryClassifier
+from .checkpoint import RunCheckpoint
+from .engine import score_blocks
+from .evaluation import evaluate_modes
+from .incremental import IncrementalRegistry
+from .instrumentation import RunProfiler
+from .ngram_profiler import profile_ngram_configs, suggest_config
+from .progress import CancellationToken, MatchCancelled, ProgressTracker
+from .reverse_index import BusinessPurchaseIndex
+from .run_diff import RunDiff, diff_runs
+from .score_cache import ScoreCache
+from .sharding import ShardedRegistry
+from .small_business import flag_small_business
+from .spill import MatchSpiller
+from .synonyms import SynonymNormalizer
+from .trends import TrendTracker, parse_order_dates
+from .vector_store import VectorStore, save_model, load_csr, save_csr
+
+__all__ = ['BM25Scorer', 'plan_blocks', 'score_blocked', 'CategoryClassifier', 'RunCheckpoint', 'score_blocks', 'evaluate_modes', 'IncrementalRegistry', 'RunProfiler', 'profile_ngram_configs', 'suggest_config', 'CancellationToken', 'MatchCancelled', 'ProgressTracker', 'BusinessPurchaseIndex', 'RunDiff', 'diff_runs', 'ScoreCache', 'ShardedRegistry', 'flag_small_business', 'MatchSpiller', 'SynonymNormalizer', 'TrendTracker', 'parse_order_dates', 'VectorStore', 'save_model', 'load_csr', 'save_csr']
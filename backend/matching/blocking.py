@@ -0,0 +1,130 @@
+"""
+Spend-type blocking: score purchases only against businesses that serve their spend types
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from .engine import DEFAULT_CHUNK_SIZE, score_blocks
+
+# Spend type -> purchase amount column; the bit of each type is its position here
+SPEND_TYPE_COLUMNS = {
+    'Goods': 'Goods (Amt)',
+    'Services': 'Services (Amt)',
+    'Construction': 'Construction (Amt)',
+    'IT': 'IT (Amt)'
+}
+SPEND_TYPES = list(SPEND_TYPE_COLUMNS)
+ALL_SPEND_TYPES = (1 << len(SPEND_TYPES)) - 1
+SPEND_TYPE_SEPARATORS = r'[;,|/]'
+
+# (purchase positions, business positions) scored as one independent sub-problem
+Block = Tuple[np.ndarray, np.ndarray]
+
+
+def purchase_spend_masks(purchase_df: pd.DataFrame) -> np.ndarray:
+    """Bitmask of the spend types with a nonzero amount on each purchase (0 = unknown)"""
+    masks = np.zeros(len(purchase_df), dtype=np.int64)
+    for bit, column in enumerate(SPEND_TYPE_COLUMNS.values()):
+        if column in purchase_df.columns:
+            amounts = pd.to_numeric(purchase_df[column], errors='coerce').fillna(0).to_numpy()
+            masks |= (amounts != 0).astype(np.int64) << bit
+    return masks
+
+
+def business_spend_masks(spend_types: pd.Series) -> np.ndarray:
+    """Bitmask of the spend types each business serves, from values like "Goods;Services"
+
+    Businesses with no (or only unrecognized) spend types serve everything.
+    """
+    lookup = {name.lower(): 1 << bit for bit, name in enumerate(SPEND_TYPES)}
+    tokens = (spend_types.fillna('').astype(str).str.lower()
+              .str.split(SPEND_TYPE_SEPARATORS, regex=True).explode().str.strip())
+    bits = tokens.map(lookup).fillna(0).astype(np.int64)
+    masks = bits.groupby(level=0).agg(np.bitwise_or.reduce).reindex(spend_types.index, fill_value=0)
+    masks = masks.to_numpy(dtype=np.int64, copy=True)
+    masks[masks == 0] = ALL_SPEND_TYPES
+    return masks
+
+
+def plan_blocks(purchase_masks: np.ndarray, business_masks: np.ndarray) -> List[Block]:
+    """Group purchases that are compatible with exactly the same businesses
+
+    A purchase is compatible with a business when they share a spend type;
+    purchases without any spend type (mask 0) are compared with every business
+    and purchases that no business serves are left out.
+    """
+    mask_values, inverse = np.unique(purchase_masks, return_inverse=True)
+    groups: Dict[bytes, List[int]] = {}
+    business_sets: Dict[bytes, np.ndarray] = {}
+    for index, mask in enumerate(mask_values):
+        if mask == 0:
+            cols = np.arange(len(business_masks))
+        else:
+            cols = np.flatnonzero(business_masks & mask)
+        key = cols.tobytes()
+        groups.setdefault(key, []).append(index)
+        business_sets[key] = cols
+
+    blocks = []
+    for key, indices in groups.items():
+        cols = business_sets[key]
+        if len(cols) == 0:
+            continue
+        rows = np.flatnonzero(np.isin(inverse, indices))
+        blocks.append((rows, cols))
+    return blocks
+
+
+def compatible_pairs(purchase_masks: np.ndarray, business_masks: np.ndarray,
+                     rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """Which (purchase, business) pairs plan_blocks would have scored"""
+    masks = purchase_masks[rows]
+    return (masks == 0) | ((masks & business_masks[cols]) != 0)
+
+
+def score_blocked(query_vectors: sp.spmatrix, registry_t: sp.csr_matrix, blocks: List[Block],
+                  threshold: float, top_k: Optional[int] = None,
+                  chunk_size: Optional[int] = None, n_jobs: int = 1,
+                  normalize_queries: bool = True) -> Iterator[Tuple[Block, np.ndarray, np.ndarray, np.ndarray]]:
+    """Score every block on its own and yield (block, rows, cols, scores) in global positions
+
+    Each purchase belongs to exactly one block, so per-purchase top-k stays
+    exact. Blocks share nothing but read-only matrices and run on n_jobs
+    worker threads; results are yielded in block order.
+    """
+    query_vectors = sp.csr_matrix(query_vectors)
+    registry_t = sp.csc_matrix(registry_t)  # cheap column slicing per block
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+
+    def run(block: Block):
+        block_rows, block_cols = block
+        parts = list(score_blocks(
+            query_vectors[block_rows], None, threshold, top_k=top_k, chunk_size=chunk_size,
+            registry_t=sp.csr_matrix(registry_t[:, block_cols]), normalize_queries=normalize_queries
+        ))
+        rows = np.concatenate([part[1] for part in parts]) if parts else np.array([], dtype=np.int64)
+        cols = np.concatenate([part[2] for part in parts]) if parts else np.array([], dtype=np.int64)
+        scores = np.concatenate([part[3] for part in parts]) if parts else np.array([], dtype=np.float64)
+        return block, block_rows[rows], block_cols[cols], scores
+
+    if n_jobs is None or n_jobs <= 1:
+        for block in blocks:
+            yield run(block)
+        return
+
+    # Bounded window of blocks in flight, yielded in block order; a consumer
+    # that stops early only waits for the blocks already submitted
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        pending = deque()
+        for block in blocks:
+            pending.append(executor.submit(run, block))
+            if len(pending) >= 2 * n_jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
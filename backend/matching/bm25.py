@@ -0,0 +1,68 @@
+"""
+BM25 scoring expressed as one sparse product, so it runs on the chunked engine
+"""
+
+import numpy as np
+import scipy.sparse as sp
+
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+# BM25 scores are not on the cosine scale, so the threshold is its own: on the
+# bundled sample, 0.12 keeps only matches that agree with the labeled cosine
+# pairs (49 of 49), while the cosine default of 0.1 admits 103 more that do not
+DEFAULT_BM25_THRESHOLD = 0.12
+
+
+class BM25Scorer:
+    """Okapi BM25 with the registry businesses as documents
+
+    fit() precomputes each document's length norm k1 * (1 - b + b * dl / avgdl)
+    and the full per-term weight, so scoring a block of purchases is
+    query_vectors @ registry_t, the same cost as cosine. Query rows are
+    binary term indicators divided by the query's best attainable score,
+    which keeps scores in [0, 1). That range is not calibrated against cosine:
+    use DEFAULT_BM25_THRESHOLD rather than a cosine threshold.
+    """
+
+    def __init__(self, k1: float = DEFAULT_K1, b: float = DEFAULT_B):
+        if k1 < 0 or not 0 <= b <= 1:
+            raise ValueError("BM25 needs k1 >= 0 and 0 <= b <= 1")
+        self.k1 = k1
+        self.b = b
+        self.idf = None
+        self.length_norms = None
+        self.registry_t = None
+
+    def fit(self, registry_counts: sp.spmatrix) -> 'BM25Scorer':
+        """Precompute IDF, document-length norms and term weights from raw registry counts"""
+        counts = sp.csr_matrix(registry_counts, dtype=np.float64)
+        counts.eliminate_zeros()
+        n_docs = counts.shape[0]
+
+        doc_lengths = np.asarray(counts.sum(axis=1)).ravel()
+        avg_length = doc_lengths.mean() if n_docs and doc_lengths.mean() > 0 else 1.0
+        self.length_norms = self.k1 * (1 - self.b + self.b * doc_lengths / avg_length)
+
+        df = np.bincount(counts.indices, minlength=counts.shape[1])
+        self.idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+        # w(d, t) = idf(t) * tf * (k1 + 1) / (tf + norm(d)), only on stored entries
+        weights = counts.copy()
+        row_of_entry = np.repeat(np.arange(n_docs), np.diff(counts.indptr))
+        tf = counts.data
+        weights.data = self.idf[counts.indices] * tf * (self.k1 + 1) / (tf + self.length_norms[row_of_entry])
+        self.registry_t = sp.csr_matrix(weights.T)
+        return self
+
+    def query_vectors(self, query_counts: sp.spmatrix) -> sp.csr_matrix:
+        """Binary query term rows scaled by 1 / (sum of idf * (k1 + 1)) over their terms"""
+        if self.registry_t is None:
+            raise ValueError("BM25 scorer has not been fitted")
+
+        queries = sp.csr_matrix(query_counts, dtype=np.float64)
+        queries.eliminate_zeros()
+        queries.data[:] = 1.0
+
+        upper_bound = queries @ (self.idf * (self.k1 + 1))
+        scale = np.divide(1.0, upper_bound, out=np.zeros_like(upper_bound), where=upper_bound > 0)
+        return sp.csr_matrix(sp.diags(scale) @ queries)
@@ -0,0 +1,79 @@
+"""
+Nearest-centroid business category classifier over TF-IDF vectors
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from .engine import DEFAULT_CHUNK_SIZE
+
+DEFAULT_CATEGORY = 'Other'
+
+
+class CategoryClassifier:
+    """Assigns each purchase the category whose centroid it is most similar to
+
+    Centroids are the normalized mean of the labeled registry vectors in each
+    category. Purchases whose best centroid scores below min_score get
+    default_category.
+    """
+
+    def __init__(self, min_score: float = 0.05, default_category: str = DEFAULT_CATEGORY):
+        self.min_score = min_score
+        self.default_category = default_category
+        self.categories: List[str] = []
+        self.centroids: Optional[sp.csr_matrix] = None
+
+    @property
+    def fitted(self) -> bool:
+        return self.centroids is not None
+
+    def fit(self, registry_vectors: sp.spmatrix, labels: Sequence[str]) -> 'CategoryClassifier':
+        """Build one centroid per category from labeled registry vectors
+
+        With no labeled rows (e.g. an empty category column) the classifier is
+        left unfitted instead of failing; check fitted before predicting.
+        """
+        labels = pd.Series(list(labels), dtype=object)
+        labeled = labels.notna() & (labels.astype(str).str.strip() != '')
+        if not labeled.any():
+            self.categories = []
+            self.centroids = None
+            return self
+
+        codes, categories = pd.factorize(labels[labeled])
+        rows = np.flatnonzero(labeled.to_numpy())
+        counts = np.bincount(codes)
+
+        # (k x n_registry) averaging matrix, so all centroids come from one sparse product
+        averaging = sp.csr_matrix(
+            (1.0 / counts[codes], (codes, rows)), shape=(len(categories), registry_vectors.shape[0])
+        )
+        self.centroids = sp.csr_matrix(normalize(averaging @ normalize(registry_vectors)))
+        self.categories = list(categories)
+        return self
+
+    def predict(self, vectors: sp.spmatrix, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+        """Category label and centroid similarity for every row"""
+        if self.centroids is None:
+            raise ValueError("Classifier has not been fitted")
+
+        vectors = sp.csr_matrix(vectors)
+        centroids_t = sp.csr_matrix(self.centroids.T)
+        names = np.array(self.categories + [self.default_category], dtype=object)
+
+        labels = np.empty(vectors.shape[0], dtype=object)
+        scores = np.zeros(vectors.shape[0])
+        for start in range(0, vectors.shape[0], chunk_size):
+            block = normalize(vectors[start:start + chunk_size]) @ centroids_t
+            block = block.toarray()  # (chunk x k) is small: k is the number of categories
+            best = block.argmax(axis=1)
+            best_scores = block[np.arange(len(best)), best]
+            best[best_scores < self.min_score] = len(self.categories)
+            labels[start:start + len(best)] = names[best]
+            scores[start:start + len(best)] = best_scores
+        return labels, scores
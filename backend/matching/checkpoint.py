@@ -0,0 +1,126 @@
+"""
+Checkpoints of finished scoring batches so an interrupted run can resume
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, Union
+
+import numpy as np
+import scipy.sparse as sp
+
+MANIFEST_NAME = 'manifest.json'
+
+PathLike = Union[str, Path]
+
+
+def run_fingerprint(config: Dict, *arrays) -> str:
+    """Digest of a run's settings and every matrix/array its scores are computed from"""
+    digest = hashlib.sha1()
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode())
+    for array in arrays:
+        if array is None:
+            digest.update(b'none')
+        elif sp.issparse(array):
+            array = sp.csr_matrix(array)
+            digest.update(repr(array.shape).encode())
+            for part in (array.indptr, array.indices, array.data):
+                digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            array = np.ascontiguousarray(array)
+            digest.update(repr((array.shape, array.dtype.str)).encode())
+            digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def _fsync_directory(directory: Path):
+    """Make renames into directory durable (directories cannot be opened for fsync on Windows)"""
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _replace_json(path: Path, data: Dict):
+    """Write JSON atomically and durably: a crash leaves either the old or the new file"""
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_directory(path.parent)
+
+
+class RunCheckpoint:
+    """Directory of per-batch score files plus a manifest of how many batches are committed
+
+    Batches are committed strictly in order, each file before the manifest
+    entry that counts it, so the manifest always describes a complete prefix
+    of the run. A manifest whose fingerprint differs from the current run's
+    (other inputs, model or settings) is discarded.
+    """
+
+    def __init__(self, directory: PathLike):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.directory / MANIFEST_NAME
+        self.manifest: Dict = {}
+
+    def _batch_path(self, index: int) -> Path:
+        return self.directory / f"batch_{index:06d}.npz"
+
+    def start(self, fingerprint: str) -> int:
+        """Open the checkpoint for a run and return the number of batches already committed"""
+        manifest = {}
+        if self.manifest_path.exists():
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        if manifest.get('fingerprint') != fingerprint:
+            for stale in self.directory.glob("batch_*.npz"):
+                stale.unlink()
+            manifest = {'fingerprint': fingerprint, 'committed_batches': 0, 'complete': False}
+            _replace_json(self.manifest_path, manifest)
+        self.manifest = manifest
+        return manifest['committed_batches']
+
+    def restore(self) -> Iterator[tuple]:
+        """Committed batches as (rows in batch, pairs scored, rows, cols, scores), in order"""
+        for index in range(self.manifest['committed_batches']):
+            with np.load(self._batch_path(index)) as batch:
+                yield (int(batch['batch_size']), int(batch['batch_pairs']),
+                       batch['rows'], batch['cols'], batch['scores'])
+
+    def commit(self, index: int, batch: tuple):
+        """Persist one finished batch, then count it in the manifest"""
+        if index != self.manifest['committed_batches']:
+            raise ValueError(f"Batch {index} committed out of order")
+        batch_size, batch_pairs, rows, cols, scores = batch
+        tmp = self.directory / f"batch_{index:06d}.tmp.npz"
+        # The batch file must be on disk before the manifest that counts it
+        with open(tmp, 'wb') as f:
+            np.savez(f, batch_size=batch_size, batch_pairs=batch_pairs, rows=rows, cols=cols, scores=scores)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._batch_path(index))
+        _fsync_directory(self.directory)
+        self.manifest['committed_batches'] = index + 1
+        _replace_json(self.manifest_path, self.manifest)
+
+    def finish(self):
+        """Mark every batch of the run as committed"""
+        self.manifest['complete'] = True
+        _replace_json(self.manifest_path, self.manifest)
+
+    def clear(self):
+        """Remove the batch files and manifest"""
+        for path in self.directory.glob("batch_*.npz"):
+            path.unlink()
+        if self.manifest_path.exists():
+            self.manifest_path.unlink()
+        self.manifest = {}
@@ -0,0 +1,88 @@
+"""
+Chunked sparse scoring engine with optional per-purchase top-k
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# (first row of the block, row positions, registry positions, scores)
+ScoreBlock = Tuple[int, np.ndarray, np.ndarray, np.ndarray]
+
+
+def select_top_k(rows: np.ndarray, cols: np.ndarray, scores: np.ndarray,
+                 top_k: Optional[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Keep the top_k highest scores per row; output is ordered by (row, col)"""
+    if top_k is not None and len(scores) > 0:
+        # Rank within each row by descending score, ties broken by column
+        order = np.lexsort((cols, -scores, rows))
+        rows, cols, scores = rows[order], cols[order], scores[order]
+        row_starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        counts = np.diff(np.r_[row_starts, len(rows)])
+        rank = np.arange(len(rows)) - np.repeat(row_starts, counts)
+        keep = rank < top_k
+        rows, cols, scores = rows[keep], cols[keep], scores[keep]
+
+    order = np.lexsort((cols, rows))
+    return rows[order], cols[order], scores[order]
+
+
+def score_block(query_block: sp.csr_matrix, registry_t: sp.csr_matrix, threshold: float,
+                top_k: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Score one block of queries against the (transposed) registry matrix"""
+    scores = (query_block @ registry_t).tocoo()
+    mask = scores.data >= threshold
+    rows = scores.row[mask].astype(np.int64)
+    cols = scores.col[mask].astype(np.int64)
+    return select_top_k(rows, cols, scores.data[mask], top_k)
+
+
+def prepare_registry(registry_vectors: sp.spmatrix) -> sp.csr_matrix:
+    """L2-normalize and transpose the registry once so blocks are plain sparse products"""
+    return sp.csr_matrix(normalize(registry_vectors).T)
+
+
+def score_blocks(query_vectors: sp.spmatrix, registry_vectors: sp.spmatrix, threshold: float,
+                 top_k: Optional[int] = None, chunk_size: Optional[int] = None,
+                 n_jobs: int = 1, registry_t: Optional[sp.csr_matrix] = None,
+                 normalize_queries: bool = True) -> Iterator[ScoreBlock]:
+    """Yield thresholded cosine scores block by block, in query order
+
+    Pairs with zero similarity are never reported, so threshold should be > 0.
+    Other scorers (e.g. BM25) pass their own registry_t and already-weighted
+    queries with normalize_queries=False.
+    """
+    query_vectors = sp.csr_matrix(query_vectors)
+    if registry_t is None:
+        registry_t = prepare_registry(registry_vectors)
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    starts = range(0, query_vectors.shape[0], chunk_size)
+
+    def run(start: int) -> ScoreBlock:
+        block = query_vectors[start:start + chunk_size]
+        if normalize_queries:
+            block = normalize(block)
+        rows, cols, scores = score_block(block, registry_t, threshold, top_k)
+        return start, rows + start, cols, scores
+
+    if n_jobs is None or n_jobs <= 1:
+        for start in starts:
+            yield run(start)
+        return
+
+    # Keep a bounded window of blocks in flight and yield them in submission
+    # order, so output is identical to the serial path and memory stays flat
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        pending = deque()
+        for start in starts:
+            pending.append(executor.submit(run, start))
+            if len(pending) >= 2 * n_jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,111 @@
+"""
+Quality-vs-speed evaluation of matcher modes against labeled purchase -> business pairs
+"""
+
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_K_VALUES = (1, 3, 5)
+
+
+def ranking_metrics(rows: np.ndarray, cols: np.ndarray, scores: np.ndarray,
+                    labeled_rows: np.ndarray, labeled_cols: np.ndarray, n_cols: int,
+                    k_values: Sequence[int] = DEFAULT_K_VALUES) -> Dict[str, float]:
+    """precision@k, recall@k and MRR over the purchases that have labels
+
+    rows/cols/scores are the scored pairs of a run; labeled_rows/labeled_cols
+    are the relevant (purchase, business) positions.
+    """
+    labeled_keys = np.unique(labeled_rows.astype(np.int64) * n_cols + labeled_cols)
+    evaluated_rows, relevant_counts = np.unique(labeled_keys // n_cols, return_counts=True)
+    if len(evaluated_rows) == 0:
+        metrics = {}
+        for k in k_values:
+            metrics[f'precision@{k}'] = float('nan')
+            metrics[f'recall@{k}'] = float('nan')
+        metrics['mrr'] = float('nan')
+        return metrics
+
+    # Rank each purchase's businesses by descending score
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols = rows[order], cols[order]
+    row_starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]]) if len(rows) else np.array([], dtype=np.int64)
+    rank = np.arange(len(rows)) - np.repeat(row_starts, np.diff(np.r_[row_starts, len(rows)]))
+    is_relevant = np.isin(rows.astype(np.int64) * n_cols + cols, labeled_keys)
+
+    metrics = {}
+    position = np.searchsorted(evaluated_rows, rows)
+    position = np.minimum(position, len(evaluated_rows) - 1)
+    in_eval = evaluated_rows[position] == rows
+    for k in k_values:
+        hit = is_relevant & in_eval & (rank < k)
+        hits = np.bincount(position[hit], minlength=len(evaluated_rows))
+        metrics[f'precision@{k}'] = float(np.mean(hits / k))
+        metrics[f'recall@{k}'] = float(np.mean(hits / relevant_counts))
+
+    # Reciprocal rank of the first relevant business per labeled purchase
+    first = is_relevant & in_eval
+    reciprocal = np.zeros(len(evaluated_rows))
+    np.maximum.at(reciprocal, position[first], 1.0 / (rank[first] + 1))
+    metrics['mrr'] = float(reciprocal.mean())
+    return metrics
+
+
+def label_positions(labeled_pairs: pd.DataFrame, purchase_df: pd.DataFrame,
+                    business_names: Sequence[str]) -> tuple:
+    """Translate labeled (PurchaseRow, SmallBusinessName) pairs into matrix positions"""
+    name_to_col = {name: col for col, name in enumerate(business_names)}
+    labeled = labeled_pairs[labeled_pairs['SmallBusinessName'].isin(name_to_col)]
+    labeled = labeled[labeled['PurchaseRow'].between(0, len(purchase_df) - 1)]
+    return (labeled['PurchaseRow'].to_numpy(dtype=np.int64),
+            labeled['SmallBusinessName'].map(name_to_col).to_numpy(dtype=np.int64))
+
+
+def evaluate_modes(modes: Dict[str, Callable[[], Any]], purchase_df: pd.DataFrame,
+                   small_biz_df: pd.DataFrame, labeled_pairs: pd.DataFrame,
+                   k_values: Sequence[int] = DEFAULT_K_VALUES, trace_memory: bool = True) -> pd.DataFrame:
+    """Run every matcher mode on the same data and report quality and speed side by side
+
+    modes maps a mode name to a factory returning a fresh matcher. labeled_pairs
+    has PurchaseRow (position in purchase_df) and SmallBusinessName columns.
+    """
+    results = []
+    for name, factory in modes.items():
+        matcher = factory()
+        started = time.perf_counter()
+        matcher.find_matches(purchase_df, small_biz_df)
+        wall = time.perf_counter() - started
+
+        # Peak memory comes from a second, traced run on a fresh matcher; tracing distorts timings
+        peak_mb = None
+        if trace_memory:
+            tracemalloc.start()
+            factory().find_matches(purchase_df, small_biz_df)
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+
+        run = matcher.last_run
+        business_names = run['small_biz_df']['name'].tolist()
+        labeled_rows, labeled_cols = label_positions(labeled_pairs, purchase_df, business_names)
+        metrics = ranking_metrics(
+            run['rows'], run['cols'], run['scores'], labeled_rows, labeled_cols,
+            n_cols=len(business_names), k_values=k_values
+        )
+
+        pairs = run['shape'][0] * run['shape'][1]
+        row = {'mode': name}
+        row.update(metrics)
+        row.update({
+            'wall_seconds': round(wall, 4),
+            'peak_memory_mb': round(peak_mb, 2) if peak_mb is not None else None,
+            'pairs_per_second': round(pairs / wall) if wall > 0 else None,
+            'matches': len(run['scores']),
+            'labeled_purchases': len(np.unique(labeled_rows))
+        })
+        results.append(row)
+
+    return pd.DataFrame(results)
@@ -0,0 +1,168 @@
+"""
+Incremental registry updates against a frozen TF-IDF model
+"""
+
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+DEFAULT_IDF_TOLERANCE = 0.05
+
+
+def compute_idf(document_frequency: np.ndarray, n_documents: int, smooth_idf: bool = True) -> np.ndarray:
+    """IDF exactly as TfidfTransformer computes it"""
+    df = document_frequency.astype(np.float64)
+    n = float(n_documents)
+    if smooth_idf:
+        df = df + 1
+        n = n + 1
+    # Guard against terms whose every document was removed
+    df = np.maximum(df, 1e-12)
+    return np.log(n / df) + 1
+
+
+def document_frequency_of(matrix: sp.spmatrix, n_features: int) -> np.ndarray:
+    """Number of rows in which each column is non-zero"""
+    matrix = sp.csr_matrix(matrix)
+    matrix.eliminate_zeros()
+    return np.bincount(matrix.indices, minlength=n_features).astype(np.int64)
+
+
+class IncrementalRegistry:
+    """Registry vectors kept in sync with add/update/remove operations
+
+    The vocabulary stays frozen; terms outside it are ignored. Document
+    frequencies are updated on every change. Stored vectors keep the IDF
+    snapshot they were weighted with until the largest relative IDF change
+    exceeds idf_tolerance. Then every vector is re-weighted and the
+    vectorizer's IDF is replaced, so queries and registry stay consistent.
+    """
+
+    def __init__(self, vectorizer: TfidfVectorizer, registry_df: pd.DataFrame,
+                 document_frequency: np.ndarray, n_documents: int,
+                 idf_tolerance: float = DEFAULT_IDF_TOLERANCE, revision: int = 0):
+        self.vectorizer = vectorizer
+        self.idf_tolerance = idf_tolerance
+        self.document_frequency = np.array(document_frequency, dtype=np.int64)
+        self.n_documents = int(n_documents)
+        self.revision = revision
+        self.idf_snapshot = np.array(vectorizer.idf_, dtype=np.float64)
+
+        # Counts use the vectorizer's own analyzer so tokens line up with the vocabulary
+        self.counter = CountVectorizer(
+            analyzer=vectorizer.build_analyzer(), vocabulary=vectorizer.vocabulary_
+        )
+        self.registry_df = registry_df.reset_index(drop=True)
+        self.counts = self._count(self.registry_df['processed_keywords'])
+        self.vectors = self._weight(self.counts)
+
+    def _count(self, texts: Iterable[str]) -> sp.csr_matrix:
+        """Raw term counts over the frozen vocabulary"""
+        return sp.csr_matrix(self.counter.transform(list(texts)), dtype=np.float64)
+
+    def _weight(self, counts: sp.csr_matrix) -> sp.csr_matrix:
+        """Apply TF scaling, the IDF snapshot and the configured norm"""
+        weighted = counts.copy()
+        if self.vectorizer.sublinear_tf:
+            weighted.data = np.log(weighted.data) + 1
+        if self.vectorizer.use_idf:
+            weighted = sp.csr_matrix(weighted.multiply(self.idf_snapshot.reshape(1, -1)))
+        if self.vectorizer.norm:
+            weighted = normalize(weighted, norm=self.vectorizer.norm)
+        return sp.csr_matrix(weighted)
+
+    def _presence(self, counts: sp.csr_matrix) -> np.ndarray:
+        """Per-term document counts contributed by these rows"""
+        return document_frequency_of(counts, counts.shape[1])
+
+    def current_idf(self) -> np.ndarray:
+        """IDF implied by the current document frequencies"""
+        return compute_idf(self.document_frequency, self.n_documents, self.vectorizer.smooth_idf)
+
+    def idf_drift(self) -> float:
+        """Largest relative change between the current IDF and the stored snapshot"""
+        return float(np.max(np.abs(self.current_idf() - self.idf_snapshot) / self.idf_snapshot))
+
+    def _row_positions(self, names: Iterable[str]) -> np.ndarray:
+        """Matrix rows of the named businesses; unknown names are an error"""
+        names = set(names)
+        mask = self.registry_df['name'].isin(names).to_numpy()
+        missing = names - set(self.registry_df['name'][mask])
+        if missing:
+            raise KeyError(f"Unknown businesses: {sorted(missing)}")
+        return np.flatnonzero(mask)
+
+    def add(self, businesses: pd.DataFrame) -> Dict:
+        """Register new businesses (name, keywords, processed_keywords)"""
+        duplicates = set(businesses['name']) & set(self.registry_df['name'])
+        if duplicates:
+            raise ValueError(f"Businesses already registered: {sorted(duplicates)}")
+
+        counts = self._count(businesses['processed_keywords'])
+        self.document_frequency += self._presence(counts)
+        self.n_documents += counts.shape[0]
+
+        self.registry_df = pd.concat([self.registry_df, businesses], ignore_index=True)
+        self.counts = sp.vstack([self.counts, counts], format='csr')
+        self.vectors = sp.vstack([self.vectors, self._weight(counts)], format='csr')
+        return self._after_change(added=len(businesses))
+
+    def remove(self, names: Iterable[str]) -> Dict:
+        """Drop businesses from the registry"""
+        positions = self._row_positions(names)
+        self.document_frequency -= self._presence(self.counts[positions])
+        self.n_documents -= len(positions)
+
+        keep = np.setdiff1d(np.arange(len(self.registry_df)), positions)
+        self.registry_df = self.registry_df.iloc[keep].reset_index(drop=True)
+        self.counts = self.counts[keep]
+        self.vectors = self.vectors[keep]
+        return self._after_change(removed=len(positions))
+
+    def update(self, businesses: pd.DataFrame) -> Dict:
+        """Replace the keywords of existing businesses, matched by name"""
+        positions = self._row_positions(businesses['name'])
+        updates = businesses.set_index('name').loc[self.registry_df['name'].iloc[positions]]
+
+        new_counts = self._count(updates['processed_keywords'])
+        self.document_frequency += self._presence(new_counts) - self._presence(self.counts[positions])
+
+        counts = self.counts.tolil()
+        vectors = self.vectors.tolil()
+        weighted = self._weight(new_counts).tolil()
+        new_counts = new_counts.tolil()
+        for offset, position in enumerate(positions):
+            counts[position] = new_counts[offset]
+            vectors[position] = weighted[offset]
+            for column in updates.columns:
+                if column in self.registry_df.columns:
+                    self.registry_df.at[position, column] = updates[column].iloc[offset]
+        self.counts = counts.tocsr()
+        self.vectors = vectors.tocsr()
+        return self._after_change(updated=len(positions))
+
+    def _after_change(self, **changes) -> Dict:
+        """Re-weight stored vectors once IDF drift passes the tolerance"""
+        drift = self.idf_drift()
+        reweighted = drift > self.idf_tolerance
+        if reweighted:
+            self.reweight()
+        summary = {'registry_size': len(self.registry_df), 'idf_drift': drift, 'reweighted': reweighted,
+                   'revision': self.revision}
+        summary.update(changes)
+        return summary
+
+    def reweight(self):
+        """Adopt the current IDF for the vectorizer and every stored vector"""
+        self.idf_snapshot = self.current_idf()
+        self.vectorizer.idf_ = self.idf_snapshot
+        self.vectors = self._weight(self.counts)
+        self.revision += 1
+
+    def names(self) -> List[str]:
+        """Registered business names in matrix row order"""
+        return self.registry_df['name'].tolist()
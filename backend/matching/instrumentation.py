@@ -0,0 +1,94 @@
+"""
+Per-stage timing and counters for matcher runs
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # resource is not available on Windows
+    resource = None
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 2)
+
+
+class RunProfiler:
+    """Records wall time, CPU time, row counts, nnz and peak memory per pipeline stage"""
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.stages: List[Dict[str, Any]] = []
+        self.counters: Dict[str, float] = {}
+        self.metadata: Dict[str, Any] = {}
+        self.started = time.time()
+
+    @contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None):
+        """Time a block of work; the yielded dict can be filled with rows_out, nnz, etc."""
+        record = {'stage': name, 'rows_in': rows_in, 'rows_out': None, 'nnz': None}
+
+        started_tracing = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = round(time.perf_counter() - wall_start, 6)
+            record['cpu_seconds'] = round(time.process_time() - cpu_start, 6)
+            record['peak_rss_mb'] = _peak_rss_mb()
+            if self.trace_memory:
+                record['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+                if started_tracing:
+                    tracemalloc.stop()
+            self.stages.append(record)
+
+    def increment(self, name: str, value: float = 1):
+        """Add to a named run counter"""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self) -> Dict[str, Any]:
+        """Structured summary of the run so far"""
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'pid': os.getpid(),
+            'total_wall_seconds': round(sum(s['wall_seconds'] for s in self.stages), 6),
+            'total_cpu_seconds': round(sum(s['cpu_seconds'] for s in self.stages), 6),
+            'peak_rss_mb': _peak_rss_mb(),
+            'stages': list(self.stages),
+            'counters': dict(self.counters),
+            'metadata': dict(self.metadata)
+        }
+
+    def write_report(self, path) -> Path:
+        """Write the run report as JSON"""
+        path = Path(path)
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2, default=str)
+        return path
+
+
+def report_path_for(output_path) -> Path:
+    """Location of the run report written next to an export file"""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.stem + ".run.json")
@@ -0,0 +1,141 @@
+"""
+Cost and ranking-quality sweep over TF-IDF vectorizer configurations
+"""
+
+import itertools
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from .engine import score_blocks
+
+DEFAULT_NGRAM_GRID = {
+    'ngram_range': [(1, 1), (1, 2), (1, 3)],
+    'max_features': [5000, 10000, None],
+    'min_df': [1, 2]
+}
+DEFAULT_AGREEMENT_K = 5
+DEFAULT_TOLERANCE = 0.02
+
+# Scores this small still rank; the sweep compares rankings, not thresholded matches
+RANKING_THRESHOLD = 1e-9
+
+
+def config_grid(grid: Dict[str, Sequence]) -> List[Dict]:
+    """Every combination of the grid's parameter values"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def top_k_pairs(purchase_vectors, registry_vectors, k: int, chunk_size: Optional[int] = None) -> tuple:
+    """(purchase rows, row * n_businesses + business keys) of each purchase's best k businesses"""
+    n_cols = registry_vectors.shape[0]
+    rows, keys = [], []
+    for _, block_rows, block_cols, _ in score_blocks(purchase_vectors, registry_vectors, RANKING_THRESHOLD,
+                                                     top_k=k, chunk_size=chunk_size):
+        rows.append(block_rows)
+        keys.append(block_rows.astype(np.int64) * n_cols + block_cols)
+    if not rows:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    return np.concatenate(rows), np.concatenate(keys)
+
+
+def top_k_agreement(baseline: tuple, candidate: tuple) -> float:
+    """Mean share of each purchase's baseline top-k that the candidate also ranks in its top-k"""
+    rows, keys = baseline
+    if len(rows) == 0:
+        return 1.0
+    kept = np.isin(keys, candidate[1])
+    ranked_rows, per_row = np.unique(rows, return_counts=True)
+    kept_per_row = np.bincount(np.searchsorted(ranked_rows, rows[kept]), minlength=len(ranked_rows))
+    return float(np.mean(kept_per_row / per_row))
+
+
+def profile_config(params: Dict, purchase_texts: List[str], registry_texts: List[str],
+                   chunk_size: Optional[int] = None, k: int = DEFAULT_AGREEMENT_K,
+                   trace_memory: bool = True) -> tuple:
+    """Fit one vectorizer the way the matcher does and measure it; returns (metrics, top-k pairs)"""
+    texts = purchase_texts + registry_texts
+    vectorizer = TfidfVectorizer(**params)
+    started = time.perf_counter()
+    matrix = vectorizer.fit_transform(texts)
+    fit_seconds = time.perf_counter() - started
+
+    # Peak memory comes from a second, traced fit; tracing slows the fit too much to time it
+    peak_mb = None
+    if trace_memory:
+        tracemalloc.start()
+        TfidfVectorizer(**params).fit(texts)
+        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    # Transform throughput is what a frozen model pays per run
+    started = time.perf_counter()
+    purchase_vectors = vectorizer.transform(purchase_texts)
+    transform_seconds = time.perf_counter() - started
+
+    registry_vectors = matrix[len(purchase_texts):]
+    started = time.perf_counter()
+    best = top_k_pairs(purchase_vectors, registry_vectors, k, chunk_size)
+    score_seconds = time.perf_counter() - started
+
+    metrics = {
+        'fit_seconds': round(fit_seconds, 4),
+        'transform_rows_per_second': round(len(purchase_texts) / transform_seconds) if transform_seconds > 0 else None,
+        'score_seconds': round(score_seconds, 4),
+        'vocabulary_size': len(vectorizer.vocabulary_),
+        'nnz': int(matrix.nnz),
+        'matrix_mb': round((matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / (1024 * 1024), 3),
+        'fit_peak_mb': round(peak_mb, 2) if peak_mb is not None else None
+    }
+    return metrics, best
+
+
+def profile_ngram_configs(purchase_texts: List[str], registry_texts: List[str], base_params: Dict,
+                          grid: Optional[Dict[str, Sequence]] = None, k: int = DEFAULT_AGREEMENT_K,
+                          chunk_size: Optional[int] = None, trace_memory: bool = True) -> pd.DataFrame:
+    """Measure every grid configuration against the base (current) vectorizer settings
+
+    Each row has the configuration, its fit time, transform throughput,
+    scoring time, vocabulary size, matrix nnz and memory, and
+    topk_agreement: the mean share of each purchase's top-k businesses under
+    base_params that the configuration ranks in its own top-k.
+    """
+    baseline_metrics, baseline = profile_config(base_params, purchase_texts, registry_texts, chunk_size, k, trace_memory)
+    rows = [dict(_describe(base_params), config='baseline', topk_agreement=1.0, **baseline_metrics)]
+    for overrides in config_grid(grid or DEFAULT_NGRAM_GRID):
+        params = dict(base_params, **overrides)
+        if params == base_params:
+            continue
+        metrics, best = profile_config(params, purchase_texts, registry_texts, chunk_size, k, trace_memory)
+        rows.append(dict(_describe(params), config='candidate',
+                         topk_agreement=round(top_k_agreement(baseline, best), 4), **metrics))
+    results = pd.DataFrame(rows)
+    results['max_features'] = results['max_features'].astype('Int64')  # None = unlimited
+    return results
+
+
+def _describe(params: Dict) -> Dict:
+    """The swept parameters of a configuration, as table columns"""
+    ngram_range = params.get('ngram_range', (1, 1))
+    return {
+        'ngram_range': f"{ngram_range[0]}-{ngram_range[1]}",
+        'max_features': params.get('max_features'),
+        'min_df': params.get('min_df', 1)
+    }
+
+
+def suggest_config(results: pd.DataFrame, tolerance: float = DEFAULT_TOLERANCE) -> pd.Series:
+    """Smallest configuration (matrix nnz, then vocabulary) whose top-k agreement is within tolerance
+
+    Size drives scoring cost and memory and, unlike the measured times, is the
+    same on every run, so the suggestion does not flip on timing noise.
+    Configurations of equal size go to the higher agreement, then the earlier row.
+    """
+    eligible = results[results['topk_agreement'] >= 1.0 - tolerance]
+    return eligible.sort_values(['nnz', 'vocabulary_size', 'topk_agreement'], ascending=[True, True, False],
+                                kind='mergesort').iloc[0]
@@ -0,0 +1,70 @@
+"""
+Progress reporting and cooperative cancellation for long matching runs
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+ProgressCallback = Callable[[Dict], None]
+
+
+class MatchCancelled(Exception):
+    """Raised inside a matching run once its CancellationToken is cancelled"""
+
+
+class CancellationToken:
+    """Thread-safe stop flag a UI or signal handler sets and the matcher checks between blocks"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled"):
+        self.reason = reason
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise MatchCancelled(self.reason)
+
+
+class ProgressTracker:
+    """Running totals of a scoring loop, reported as one dict per finished block
+
+    The ETA extrapolates the rows/s seen so far over the rows left, so it
+    settles once a few blocks are done.
+    """
+
+    def __init__(self, total_rows: int, callback: Optional[ProgressCallback] = None):
+        self.total_rows = total_rows
+        self.callback = callback
+        self.rows_done = 0
+        self.pairs_scored = 0
+        self.started = time.perf_counter()
+
+    def update(self, rows: int, pairs: int) -> Dict:
+        self.rows_done += rows
+        self.pairs_scored += pairs
+        report = self.report()
+        if self.callback is not None:
+            self.callback(report)
+        return report
+
+    def report(self) -> Dict:
+        elapsed = time.perf_counter() - self.started
+        rows_per_second = self.rows_done / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total_rows - self.rows_done, 0)
+        return {
+            'rows_done': self.rows_done,
+            'total_rows': self.total_rows,
+            'pairs_scored': self.pairs_scored,
+            'elapsed_seconds': elapsed,
+            'rows_per_second': rows_per_second,
+            'pairs_per_second': self.pairs_scored / elapsed if elapsed > 0 else 0.0,
+            'eta_seconds': remaining / rows_per_second if rows_per_second > 0 else None
+        }
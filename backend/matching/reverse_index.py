@@ -0,0 +1,149 @@
+"""
+Per-business top purchases, built from the scores of a matching run
+
+Layout on disk:
+
+    index_dir/
+        manifest.json        # top_n, business name -> slot
+        offsets.npy          # slot i covers entries offsets[i]:offsets[i + 1]
+        purchase_rows.npy    # purchase position of each entry, best first per business
+        scores.npy           # similarity score of each entry
+        purchases.csv        # purchase details for every referenced row
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+PURCHASE_COLUMNS = ['PurchaseRow', 'CurrentSupplier', 'CurrentSupplierType', 'LineDescription', 'PurchaseAmount']
+
+PathLike = Union[str, Path]
+
+
+def top_rows_per_column(scores: sp.spmatrix, top_n: int):
+    """Column-wise partial sort of a sparse score matrix
+
+    Returns (offsets, rows, values) where column j's best rows, highest score
+    first, are rows[offsets[j]:offsets[j + 1]].
+    """
+    scores = sp.csc_matrix(scores)
+    scores.sum_duplicates()
+    n_cols = scores.shape[1]
+
+    offsets = np.zeros(n_cols + 1, dtype=np.int64)
+    top_rows: List[np.ndarray] = []
+    top_values: List[np.ndarray] = []
+
+    for j in range(n_cols):
+        start, end = scores.indptr[j], scores.indptr[j + 1]
+        values = scores.data[start:end]
+        rows = scores.indices[start:end]
+
+        if len(values) > top_n:
+            # argpartition finds the top_n in linear time; only those get sorted
+            keep = np.argpartition(-values, top_n - 1)[:top_n]
+            values, rows = values[keep], rows[keep]
+
+        order = np.lexsort((rows, -values))
+        top_rows.append(rows[order].astype(np.int64))
+        top_values.append(values[order])
+        offsets[j + 1] = offsets[j] + len(order)
+
+    rows = np.concatenate(top_rows) if top_rows else np.array([], dtype=np.int64)
+    values = np.concatenate(top_values) if top_values else np.array([], dtype=np.float64)
+    return offsets, rows, values
+
+
+class BusinessPurchaseIndex:
+    """Top-N purchases for every small business, keyed by business name"""
+
+    def __init__(self, business_names: List[str], offsets: np.ndarray, purchase_rows: np.ndarray,
+                 scores: np.ndarray, purchases: pd.DataFrame, top_n: int):
+        self.business_names = list(business_names)
+        self.slots = {name: slot for slot, name in enumerate(self.business_names)}
+        self.offsets = offsets
+        self.purchase_rows = purchase_rows
+        self.scores = scores
+        self.purchases = purchases
+        self.top_n = top_n
+
+    @classmethod
+    def build(cls, score_matrix: sp.spmatrix, purchase_df: pd.DataFrame, business_names: List[str],
+              total_amounts: np.ndarray, top_n: int = 50) -> 'BusinessPurchaseIndex':
+        """Build the index from a (purchases x businesses) sparse score matrix"""
+        offsets, rows, values = top_rows_per_column(score_matrix, top_n)
+
+        referenced = np.unique(rows)
+        purchases = pd.DataFrame({
+            'PurchaseRow': referenced,
+            'CurrentSupplier': purchase_df['Supplier Name'].to_numpy()[referenced],
+            'CurrentSupplierType': purchase_df['Supplier Type'].to_numpy()[referenced],
+            'LineDescription': purchase_df['Line Descr'].to_numpy()[referenced],
+            'PurchaseAmount': np.asarray(total_amounts)[referenced]
+        }).set_index('PurchaseRow', drop=False)
+
+        return cls(business_names, offsets, rows, values, purchases, top_n)
+
+    def businesses(self) -> List[str]:
+        """Names of all indexed businesses"""
+        return list(self.business_names)
+
+    def top_purchases(self, business_name: str, limit: Optional[int] = None) -> pd.DataFrame:
+        """Best purchases for one business, highest similarity first"""
+        slot = self.slots.get(business_name)
+        if slot is None:
+            return pd.DataFrame(columns=['Rank'] + PURCHASE_COLUMNS + ['SimilarityScore'])
+
+        start, end = int(self.offsets[slot]), int(self.offsets[slot + 1])
+        if limit is not None:
+            end = min(end, start + limit)
+
+        rows = np.asarray(self.purchase_rows[start:end])
+        result = self.purchases.loc[rows, PURCHASE_COLUMNS].reset_index(drop=True)
+        result.insert(0, 'Rank', np.arange(1, len(result) + 1))
+        result['SimilarityScore'] = np.round(np.asarray(self.scores[start:end]), 4)
+        return result
+
+    def save(self, directory: PathLike) -> Dict:
+        """Persist the index as flat .npy arrays plus a purchase table"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        np.save(directory / "offsets.npy", self.offsets)
+        np.save(directory / "purchase_rows.npy", self.purchase_rows)
+        np.save(directory / "scores.npy", self.scores)
+        self.purchases.to_csv(directory / "purchases.csv", index=False)
+
+        manifest = {
+            'top_n': self.top_n,
+            'created': pd.Timestamp.now().isoformat(),
+            'entries': int(len(self.purchase_rows)),
+            'businesses': self.slots
+        }
+        with open(directory / "manifest.json", 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    @classmethod
+    def load(cls, directory: PathLike, mmap: bool = True) -> 'BusinessPurchaseIndex':
+        """Open a saved index; arrays are memory-mapped by default"""
+        directory = Path(directory)
+        mmap_mode = 'r' if mmap else None
+
+        with open(directory / "manifest.json", 'r') as f:
+            manifest = json.load(f)
+
+        names = sorted(manifest['businesses'], key=manifest['businesses'].get)
+        purchases = pd.read_csv(directory / "purchases.csv").set_index('PurchaseRow', drop=False)
+        return cls(
+            names,
+            np.load(directory / "offsets.npy", mmap_mode=mmap_mode),
+            np.load(directory / "purchase_rows.npy", mmap_mode=mmap_mode),
+            np.load(directory / "scores.npy", mmap_mode=mmap_mode),
+            purchases,
+            manifest['top_n']
+        )
@@ -0,0 +1,145 @@
+"""
+Run-to-run match diff keyed on stable purchase and business IDs
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_DIFF_CHUNK_SIZE = 100000
+KEY_COLUMNS = ['PurchaseID', 'BusinessID']
+SCORE_COLUMN = 'SimilarityScore'
+# Exports round scores to 4 decimals; smaller deltas are format round-trip noise
+DEFAULT_SCORE_TOLERANCE = 5e-5
+
+# Mixed into the hash of repeated identical rows so every row keeps a unique ID
+_OCCURRENCE_SALT = np.uint64(0x9E3779B97F4A7C15)
+
+PathLike = Union[str, Path]
+
+
+def content_hashes(frame: pd.DataFrame, columns: Sequence[str]) -> np.ndarray:
+    """64-bit hash of each row's values in columns; identical rows are told apart by occurrence"""
+    hashes = pd.util.hash_pandas_object(frame[list(columns)], index=False).to_numpy()
+    occurrence = pd.Series(hashes).groupby(hashes).cumcount().to_numpy().astype(np.uint64)
+    return hashes ^ (occurrence * _OCCURRENCE_SALT)
+
+
+def format_ids(hashes: np.ndarray) -> np.ndarray:
+    """Fixed-width hex strings for hashes"""
+    return np.array([f'{value:016x}' for value in hashes.tolist()], dtype=object)
+
+
+def read_run_chunks(path: PathLike, chunk_size: int = DEFAULT_DIFF_CHUNK_SIZE,
+                    columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """Stream a run export (csv, parquet or json) in row chunks"""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == '.parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            yield pd.read_parquet(path, columns=columns)
+            return
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    elif suffix == '.json':
+        frame = pd.read_json(path, orient='records', precise_float=True, dtype={'PurchaseID': str, 'BusinessID': str})
+        frame = frame[columns] if columns else frame
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start:start + chunk_size]
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, usecols=columns,
+                               dtype={'PurchaseID': str, 'BusinessID': str})
+
+
+def _match_keys(frame: pd.DataFrame, path: PathLike) -> pd.Index:
+    """Hash-join key of every match row"""
+    for col in KEY_COLUMNS + [SCORE_COLUMN]:
+        if col not in frame.columns:
+            raise ValueError(f"{path} has no {col} column; it was exported before stable IDs were added")
+    return pd.Index(frame['PurchaseID'].astype(str) + ':' + frame['BusinessID'].astype(str))
+
+
+class RunDiff:
+    """Added, removed and re-scored matches between two runs"""
+
+    def __init__(self, added: pd.DataFrame, removed: pd.DataFrame, changed: pd.DataFrame, unchanged: int):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.unchanged = unchanged
+
+    def summary(self) -> Dict[str, int]:
+        """Counts of each kind of change"""
+        return {
+            'added': len(self.added),
+            'removed': len(self.removed),
+            'changed': len(self.changed),
+            'unchanged': int(self.unchanged)
+        }
+
+    def save(self, output_prefix: PathLike) -> Dict[str, str]:
+        """Write <prefix>.added/.removed/.changed.csv and a <prefix>.diff.json summary"""
+        output_prefix = Path(output_prefix)
+        paths = {}
+        for name in ['added', 'removed', 'changed']:
+            path = output_prefix.with_name(f"{output_prefix.name}.{name}.csv")
+            getattr(self, name).to_csv(path, index=False)
+            paths[name] = str(path)
+
+        summary_path = output_prefix.with_name(f"{output_prefix.name}.diff.json")
+        with open(summary_path, 'w') as f:
+            json.dump({'summary': self.summary(), 'files': paths}, f, indent=2)
+        paths['summary'] = str(summary_path)
+        return paths
+
+
+def diff_runs(old_path: PathLike, new_path: PathLike, score_tolerance: float = DEFAULT_SCORE_TOLERANCE,
+              chunk_size: int = DEFAULT_DIFF_CHUNK_SIZE) -> RunDiff:
+    """Hash join of two run exports on (PurchaseID, BusinessID)
+
+    The old run is the build side: its keys go into one hash index. The new
+    run is streamed chunk by chunk and probed against it, so neither run is
+    merged as a whole and the new run is read exactly once. A match is
+    changed when its score moved by more than score_tolerance.
+    """
+    old = pd.concat(list(read_run_chunks(old_path, chunk_size)), ignore_index=True)
+    old_keys = _match_keys(old, old_path)
+    if old_keys.has_duplicates:
+        old = old[~old_keys.duplicated()].reset_index(drop=True)
+        old_keys = _match_keys(old, old_path)
+    old_scores = old[SCORE_COLUMN].to_numpy(dtype=np.float64)
+    seen = np.zeros(len(old), dtype=bool)
+
+    added, changed = [], []
+    unchanged = 0
+    for chunk in read_run_chunks(new_path, chunk_size):
+        positions = old_keys.get_indexer(_match_keys(chunk, new_path))
+        found = positions >= 0
+        added.append(chunk[~found])
+
+        matched = chunk[found]
+        old_positions = positions[found]
+        seen[old_positions] = True
+        delta = matched[SCORE_COLUMN].to_numpy(dtype=np.float64) - old_scores[old_positions]
+        moved = np.abs(delta) > score_tolerance
+        if moved.any():
+            rescored = matched[moved].copy()
+            rescored['PreviousSimilarityScore'] = old_scores[old_positions[moved]]
+            rescored['ScoreDelta'] = np.round(delta[moved], 4)
+            changed.append(rescored)
+        unchanged += int((~moved).sum())
+
+    columns = list(old.columns)
+    return RunDiff(
+        added=pd.concat(added, ignore_index=True) if added else pd.DataFrame(columns=columns),
+        removed=old[~seen].reset_index(drop=True),
+        changed=pd.concat(changed, ignore_index=True) if changed else pd.DataFrame(
+            columns=columns + ['PreviousSimilarityScore', 'ScoreDelta']
+        ),
+        unchanged=unchanged
+    )
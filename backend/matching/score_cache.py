@@ -0,0 +1,251 @@
+"""
+Persistent SQLite cache of purchase description x business scores
+
+Scores are keyed on (model version, description hash, business hash). Only
+the scores returned by the compute function are stored (the matcher drops
+those below its threshold); which pairs have been computed at all is kept as
+"batches" - rectangles of descriptions x businesses scored together - so a
+covered pair without a stored score is known to be below the threshold.
+Storage therefore grows with the stored scores plus the rectangle edges,
+not with every pair.
+"""
+
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+DEFAULT_MAX_DESCRIPTIONS = 1000000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pair_scores (
+    model_version TEXT, desc_hash INTEGER, biz_hash INTEGER, score REAL,
+    PRIMARY KEY (model_version, desc_hash, biz_hash)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS descriptions (
+    model_version TEXT, desc_hash INTEGER, created REAL, last_used REAL,
+    PRIMARY KEY (model_version, desc_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS descriptions_last_used ON descriptions (last_used);
+CREATE TABLE IF NOT EXISTS batches (batch_id INTEGER PRIMARY KEY, model_version TEXT, created REAL);
+CREATE TABLE IF NOT EXISTS batch_descriptions (
+    batch_id INTEGER, desc_hash INTEGER, PRIMARY KEY (batch_id, desc_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS batch_descriptions_desc ON batch_descriptions (desc_hash);
+CREATE TABLE IF NOT EXISTS batch_businesses (
+    batch_id INTEGER, biz_hash INTEGER, PRIMARY KEY (batch_id, biz_hash)
+) WITHOUT ROWID;
+"""
+
+# compute(description positions, business positions) -> scores of that rectangle
+ComputeScores = Callable[[np.ndarray, np.ndarray], sp.spmatrix]
+
+
+def text_hashes(texts: pd.Series) -> np.ndarray:
+    """Signed 64-bit content hash per text (SQLite integers are signed)"""
+    return pd.util.hash_pandas_object(texts.fillna('').astype(str), index=False).to_numpy().view(np.int64)
+
+
+def model_version(vectorizer, extra: Optional[Dict] = None) -> str:
+    """Digest of everything a score depends on besides the two texts"""
+    digest = hashlib.sha1()
+    digest.update(repr(sorted((extra or {}).items())).encode())
+    digest.update(repr(vectorizer.get_params()).encode())
+    digest.update('\n'.join(vectorizer.get_feature_names_out()).encode())
+    digest.update(np.ascontiguousarray(vectorizer.idf_, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+class ScoreCache:
+    """SQLite score cache with LRU (max_descriptions) and TTL eviction per description"""
+
+    def __init__(self, path: Union[str, Path], max_descriptions: int = DEFAULT_MAX_DESCRIPTIONS,
+                 ttl_seconds: Optional[float] = None):
+        self.path = Path(path)
+        self.max_descriptions = max_descriptions
+        self.ttl_seconds = ttl_seconds
+        self.connection = sqlite3.connect(str(self.path))
+        self.connection.executescript(SCHEMA)
+        self.last_stats: Dict = {}
+
+    def close(self):
+        self.connection.close()
+
+    def _load_lookup(self, table: str, column: str, hashes: np.ndarray):
+        """Fill a temp table mapping hash -> position for joins"""
+        self.connection.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {table} ({column} INTEGER PRIMARY KEY, position INTEGER)"
+        )
+        self.connection.execute(f"DELETE FROM {table}")
+        self.connection.executemany(
+            f"INSERT INTO {table} VALUES (?, ?)", zip(hashes.tolist(), range(len(hashes)))
+        )
+
+    def _memberships(self, version: str, member_table: str, lookup_table: str, column: str) -> pd.DataFrame:
+        """(batch_id, position) for every looked-up hash covered by a batch of this version"""
+        rows = self.connection.execute(
+            f"SELECT m.batch_id, l.position FROM {member_table} m "
+            f"JOIN {lookup_table} l ON m.{column} = l.{column} "
+            f"JOIN batches b ON b.batch_id = m.batch_id WHERE b.model_version = ?", (version,)
+        ).fetchall()
+        return pd.DataFrame(rows, columns=['batch_id', 'position'], dtype=np.int64)
+
+    def _missing_rectangles(self, version: str, n_desc: int, n_biz: int) -> List[tuple]:
+        """Rectangles (description positions, business positions) that cover every unscored pair
+
+        Descriptions covered by the same set of batches share their covered
+        businesses, so they are grouped and each group misses one column set.
+        """
+        desc_members = self._memberships(version, 'batch_descriptions', 'lookup_desc', 'desc_hash')
+        biz_members = self._memberships(version, 'batch_businesses', 'lookup_biz', 'biz_hash')
+        biz_by_batch = {batch: group.to_numpy() for batch, group in biz_members.groupby('batch_id')['position']}
+
+        # Signature of a description = sum of random 64-bit weights of its batches,
+        # so descriptions covered by the same batches land in the same group
+        batch_codes, batch_ids = pd.factorize(desc_members['batch_id'])
+        weights = np.random.default_rng(0).integers(1, 2 ** 63, size=len(batch_ids), dtype=np.uint64)
+        signatures = np.zeros(n_desc, dtype=np.uint64)
+        np.add.at(signatures, desc_members['position'].to_numpy(), weights[batch_codes])
+        _, first_of_group, group_of = np.unique(signatures, return_index=True, return_inverse=True)
+
+        representatives = desc_members[desc_members['position'].isin(first_of_group)]
+        batches_of = representatives.groupby('position')['batch_id'].apply(sorted).to_dict()
+        groups = {
+            tuple(batches_of.get(first, [])): np.flatnonzero(group_of == group)
+            for group, first in enumerate(first_of_group)
+        }
+
+        rectangles = []
+        for signature, positions in groups.items():
+            covered = np.zeros(n_biz, dtype=bool)
+            for batch in signature:
+                covered[biz_by_batch.get(batch, [])] = True
+            missing = np.flatnonzero(~covered)
+            if len(missing):
+                rectangles.append((positions.astype(np.int64), missing))
+        return rectangles
+
+    def scores(self, version: str, desc_hashes: np.ndarray, biz_hashes: np.ndarray,
+               compute: ComputeScores) -> sp.csr_matrix:
+        """Scores of every (distinct) description x (distinct) business, computing only unscored pairs"""
+        now = time.time()
+        self.expire(now)
+        n_desc, n_biz = len(desc_hashes), len(biz_hashes)
+        self._load_lookup('lookup_desc', 'desc_hash', desc_hashes)
+        self._load_lookup('lookup_biz', 'biz_hash', biz_hashes)
+
+        cached = np.array(self.connection.execute(
+            "SELECT d.position, b.position, p.score FROM pair_scores p "
+            "JOIN lookup_desc d ON p.desc_hash = d.desc_hash "
+            "JOIN lookup_biz b ON p.biz_hash = b.biz_hash WHERE p.model_version = ?", (version,)
+        ).fetchall(), dtype=np.float64).reshape(-1, 3)
+        rows, cols, values = [cached[:, 0].astype(np.int64)], [cached[:, 1].astype(np.int64)], [cached[:, 2]]
+
+        pairs_computed = 0
+        for desc_positions, biz_positions in self._missing_rectangles(version, n_desc, n_biz):
+            block = sp.coo_matrix(compute(desc_positions, biz_positions))
+            block_rows, block_cols = desc_positions[block.row], biz_positions[block.col]
+            rows.append(block_rows)
+            cols.append(block_cols)
+            values.append(block.data)
+            pairs_computed += len(desc_positions) * len(biz_positions)
+            self._store_batch(version, desc_hashes[desc_positions], biz_hashes[biz_positions],
+                              desc_hashes[block_rows], biz_hashes[block_cols], block.data, now)
+
+        self.touch(version, now)
+        self.evict()
+        self.connection.commit()
+
+        total_pairs = n_desc * n_biz
+        self.last_stats = {
+            'model_version': version,
+            'descriptions': n_desc,
+            'businesses': n_biz,
+            'pairs_cached': total_pairs - pairs_computed,
+            'pairs_computed': pairs_computed,
+            'hit_ratio': round((total_pairs - pairs_computed) / total_pairs, 4) if total_pairs else None
+        }
+        return sp.csr_matrix(
+            (np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))), shape=(n_desc, n_biz)
+        )
+
+    def _store_batch(self, version: str, batch_desc: np.ndarray, batch_biz: np.ndarray,
+                     pair_desc: np.ndarray, pair_biz: np.ndarray, pair_scores: np.ndarray, now: float):
+        """Record a scored rectangle and its nonzero scores"""
+        cursor = self.connection.execute(
+            "INSERT INTO batches (model_version, created) VALUES (?, ?)", (version, now)
+        )
+        batch_id = cursor.lastrowid
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO batch_descriptions VALUES (?, ?)",
+            ((batch_id, value) for value in batch_desc.tolist())
+        )
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO batch_businesses VALUES (?, ?)",
+            ((batch_id, value) for value in batch_biz.tolist())
+        )
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO pair_scores VALUES (?, ?, ?, ?)",
+            zip([version] * len(pair_scores), pair_desc.tolist(), pair_biz.tolist(), pair_scores.tolist())
+        )
+
+    def touch(self, version: str, now: float):
+        """Mark the looked-up descriptions as used now (inserting them if new)"""
+        self.connection.execute(
+            "INSERT INTO descriptions SELECT ?, desc_hash, ?, ? FROM lookup_desc WHERE true "
+            "ON CONFLICT (model_version, desc_hash) DO UPDATE SET last_used = excluded.last_used",
+            (version, now, now)
+        )
+
+    def _drop_descriptions(self, where: str, params: tuple) -> int:
+        """Delete the selected descriptions with their scores and batch memberships"""
+        self.connection.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS evicted (model_version TEXT, desc_hash INTEGER)"
+        )
+        self.connection.execute("DELETE FROM evicted")
+        self.connection.execute(
+            f"INSERT INTO evicted SELECT model_version, desc_hash FROM descriptions {where}", params
+        )
+        count = self.connection.execute("SELECT COUNT(*) FROM evicted").fetchone()[0]
+        if count == 0:
+            return 0
+
+        self.connection.execute(
+            "DELETE FROM pair_scores WHERE (model_version, desc_hash) IN (SELECT model_version, desc_hash FROM evicted)"
+        )
+        self.connection.execute(
+            "DELETE FROM batch_descriptions WHERE (SELECT model_version FROM batches b "
+            "WHERE b.batch_id = batch_descriptions.batch_id) || ':' || desc_hash "
+            "IN (SELECT model_version || ':' || desc_hash FROM evicted)"
+        )
+        self.connection.execute(
+            "DELETE FROM descriptions WHERE (model_version, desc_hash) IN (SELECT model_version, desc_hash FROM evicted)"
+        )
+        # Batches without descriptions cover nothing any more
+        self.connection.execute(
+            "DELETE FROM batches WHERE batch_id NOT IN (SELECT DISTINCT batch_id FROM batch_descriptions)"
+        )
+        self.connection.execute(
+            "DELETE FROM batch_businesses WHERE batch_id NOT IN (SELECT batch_id FROM batches)"
+        )
+        return count
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """TTL eviction: drop descriptions first cached more than ttl_seconds ago"""
+        if self.ttl_seconds is None:
+            return 0
+        cutoff = (now or time.time()) - self.ttl_seconds
+        return self._drop_descriptions("WHERE created < ?", (cutoff,))
+
+    def evict(self) -> int:
+        """LRU eviction down to max_descriptions"""
+        count = self.connection.execute("SELECT COUNT(*) FROM descriptions").fetchone()[0]
+        excess = count - self.max_descriptions
+        if excess <= 0:
+            return 0
+        return self._drop_descriptions("ORDER BY last_used LIMIT ?", (excess,))
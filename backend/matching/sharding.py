@@ -0,0 +1,151 @@
+"""
+Registry split into shards that are scored in parallel and merged back exactly
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from .engine import DEFAULT_CHUNK_SIZE, ScoreBlock, score_block, select_top_k
+
+SHARD_STRATEGIES = ['hash', 'category']
+
+
+class RegistryShard:
+    """One slice of the registry with its own transposed, normalized matrix
+
+    registry_t is (terms x businesses) CSR, i.e. an inverted index from each
+    term to the businesses using it; terms marks the non-empty rows so query
+    blocks sharing no term with the shard can skip it.
+    """
+
+    def __init__(self, key, positions: np.ndarray, vectors: sp.spmatrix, normalize_rows: bool = True):
+        self.key = key
+        self.positions = positions
+        vectors = sp.csr_matrix(vectors)
+        self.fingerprint = _fingerprint(vectors)
+        self.registry_t = sp.csr_matrix((normalize(vectors) if normalize_rows else vectors).T)
+        self.terms = np.diff(self.registry_t.indptr) > 0
+
+    def score(self, block: sp.csr_matrix, block_terms: np.ndarray, threshold: float,
+              top_k: Optional[int]) -> tuple:
+        """Scores of a query block against this shard, in global registry positions"""
+        if len(self.positions) == 0 or not np.any(block_terms & self.terms):
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, np.array([], dtype=np.float64)
+        rows, cols, scores = score_block(block, self.registry_t, threshold, top_k)
+        return rows, self.positions[cols], scores
+
+
+def _fingerprint(vectors: sp.csr_matrix) -> int:
+    """Content hash of a shard's vectors, used to skip rebuilding unchanged shards"""
+    vectors = sp.csr_matrix(vectors)
+    vectors.sort_indices()
+    return hash((vectors.shape, vectors.indptr.tobytes(), vectors.indices.tobytes(), vectors.data.tobytes()))
+
+
+def shard_keys(registry_df: pd.DataFrame, n_shards: int, by: str = 'hash') -> np.ndarray:
+    """Shard of every registry row: a stable hash of its name, or its category"""
+    if by == 'category':
+        if 'category' not in registry_df.columns:
+            raise ValueError("Sharding by category needs a category column in the registry")
+        return registry_df['category'].fillna('').astype(str).replace('', 'Other').to_numpy(dtype=object)
+    if by != 'hash':
+        raise ValueError(f"Unknown shard strategy: {by}")
+    hashes = pd.util.hash_pandas_object(registry_df['name'].astype(str), index=False).to_numpy()
+    return (hashes % np.uint64(n_shards)).astype(np.int64)
+
+
+class ShardedRegistry:
+    """Registry shards with a thread fan-out per query block and an exact top-k merge
+
+    Every shard keeps its own top_k per purchase, so the union of the shard
+    results always contains the global top_k; merging them with one more
+    top-k selection gives exactly the unsharded answer.
+    """
+
+    def __init__(self, n_shards: int = 4, by: str = 'hash', n_jobs: int = 1):
+        if by not in SHARD_STRATEGIES:
+            raise ValueError(f"Unknown shard strategy: {by}")
+        self.n_shards = n_shards
+        self.by = by
+        self.n_jobs = n_jobs
+        self.shards: Dict = {}
+        self.n_features = None
+
+    def build(self, registry_vectors: sp.spmatrix, registry_df: pd.DataFrame,
+              normalize_rows: bool = True) -> List:
+        """(Re)build the shards from the registry; only shards whose content changed are rebuilt
+
+        Returns the keys of the rebuilt shards. Shards whose businesses only
+        moved position (e.g. after a removal elsewhere) keep their matrix.
+        """
+        registry_vectors = sp.csr_matrix(registry_vectors)
+        if registry_vectors.shape[1] != self.n_features:
+            self.shards = {}  # new vocabulary: nothing can be reused
+        self.n_features = registry_vectors.shape[1]
+
+        keys = shard_keys(registry_df, self.n_shards, self.by)
+        codes, unique_keys = pd.factorize(keys)
+        rebuilt, shards = [], {}
+        for code, key in enumerate(unique_keys):
+            positions = np.flatnonzero(codes == code)
+            vectors = registry_vectors[positions]
+            shard = self.shards.get(key)
+            if shard is not None and shard.fingerprint == _fingerprint(vectors):
+                shard.positions = positions
+            else:
+                shard = RegistryShard(key, positions, vectors, normalize_rows=normalize_rows)
+                rebuilt.append(key)
+            shards[key] = shard
+        self.shards = shards
+        return rebuilt
+
+    def rebuild_shard(self, key, registry_vectors: sp.spmatrix, registry_df: pd.DataFrame,
+                      normalize_rows: bool = True) -> RegistryShard:
+        """Rebuild a single shard from the current registry"""
+        positions = np.flatnonzero(shard_keys(registry_df, self.n_shards, self.by) == key)
+        shard = RegistryShard(key, positions, sp.csr_matrix(registry_vectors)[positions], normalize_rows)
+        self.shards[key] = shard
+        return shard
+
+    def shard_sizes(self) -> Dict:
+        """Businesses per shard"""
+        return {str(key): len(shard.positions) for key, shard in self.shards.items()}
+
+    def score(self, query_vectors: sp.spmatrix, threshold: float, top_k: Optional[int] = None,
+              chunk_size: Optional[int] = None, normalize_queries: bool = True) -> Iterator[ScoreBlock]:
+        """Yield (start, rows, cols, scores) per query block, like engine.score_blocks"""
+        query_vectors = sp.csr_matrix(query_vectors)
+        chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        shards = list(self.shards.values())
+
+        executor = ThreadPoolExecutor(max_workers=self.n_jobs) if self.n_jobs and self.n_jobs > 1 else None
+        try:
+            for start in range(0, query_vectors.shape[0], chunk_size):
+                block = query_vectors[start:start + chunk_size]
+                if normalize_queries:
+                    block = normalize(block)
+                block_terms = np.zeros(query_vectors.shape[1], dtype=bool)
+                block_terms[block.indices] = True
+
+                if executor is None:
+                    parts = [shard.score(block, block_terms, threshold, top_k) for shard in shards]
+                else:
+                    parts = list(executor.map(
+                        lambda shard: shard.score(block, block_terms, threshold, top_k), shards
+                    ))
+
+                # Exact merge: each shard's top_k is a superset of its share of the global top_k
+                rows = np.concatenate([part[0] for part in parts]) if parts else np.array([], dtype=np.int64)
+                cols = np.concatenate([part[1] for part in parts]) if parts else np.array([], dtype=np.int64)
+                scores = np.concatenate([part[2] for part in parts]) if parts else np.array([], dtype=np.float64)
+                rows, cols, scores = select_top_k(rows, cols, scores, top_k)
+                yield start, rows + start, cols, scores
+        finally:
+            if executor is not None:
+                executor.shutdown()
@@ -0,0 +1,29 @@
+"""
+Recognize purchases whose current supplier is already a small or diverse business
+"""
+
+import re
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+# Same indicators the dashboards use to count current small-business POs
+SMALL_BUSINESS_INDICATORS = ['OSB', 'SB', 'SMALL', 'MINORITY', 'WOMEN', 'DIVERSE']
+
+
+def compile_indicators(indicators: Iterable[str] = SMALL_BUSINESS_INDICATORS) -> re.Pattern:
+    """One alternation over the (uppercase) indicators, matched as substrings"""
+    return re.compile('|'.join(re.escape(indicator.upper()) for indicator in indicators))
+
+
+SMALL_BUSINESS_PATTERN = compile_indicators()
+
+
+def flag_small_business(supplier_types: pd.Series, pattern: Optional[re.Pattern] = None) -> np.ndarray:
+    """Boolean array: supplier type contains any small-business indicator"""
+    pattern = pattern or SMALL_BUSINESS_PATTERN
+    # Supplier types repeat heavily, so each distinct value is matched once
+    codes, uniques = pd.factorize(supplier_types.fillna('').astype(str))
+    flags = pd.Series(uniques, dtype=object).str.upper().str.contains(pattern, regex=True).to_numpy(dtype=bool)
+    return flags[codes]
@@ -0,0 +1,122 @@
+"""
+Disk-spilled match runs and an external k-way merge into one sorted CSV
+"""
+
+import csv
+import heapq
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_OPEN_RUNS = 64
+SCORE_COLUMN = 'SimilarityScore'
+
+# Positions kept on every spilled row so ties merge in (purchase, business) order
+ROW_COLUMN = '_row'
+COL_COLUMN = '_col'
+
+PathLike = Union[str, Path]
+
+
+class MatchSpiller:
+    """Writes each block of matches as a score-sorted CSV run and merges the runs at the end
+
+    Rows are ordered by descending score, then purchase and business
+    position, which is exactly the order of a stable in-memory sort of the
+    (purchase, business)-ordered matches. Only one row per open run is held
+    during the merge, and at most max_open_runs files are open at once.
+    """
+
+    def __init__(self, directory: Optional[PathLike] = None, max_open_runs: int = DEFAULT_MAX_OPEN_RUNS):
+        self.owns_directory = directory is None
+        self.directory = Path(tempfile.mkdtemp(prefix="match_runs_") if directory is None else directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_open_runs = max(2, max_open_runs)
+        self.runs: List[Path] = []
+        self.columns: Optional[List[str]] = None
+        self.rows_spilled = 0
+        self._next_run = 0
+
+    def _run_path(self) -> Path:
+        path = self.directory / f"run_{self._next_run:06d}.csv"
+        self._next_run += 1
+        return path
+
+    def add_run(self, matches: pd.DataFrame, rows: np.ndarray, cols: np.ndarray):
+        """Sort one block of match rows (aligned with their positions) and spill it"""
+        if matches.empty:
+            return
+        if self.columns is None:
+            self.columns = list(matches.columns)
+        order = np.lexsort((cols, rows, -matches[SCORE_COLUMN].to_numpy(dtype=np.float64)))
+        run = matches.iloc[order].assign(**{ROW_COLUMN: rows[order], COL_COLUMN: cols[order]})
+        path = self._run_path()
+        run.to_csv(path, index=False)
+        self.runs.append(path)
+        self.rows_spilled += len(run)
+
+    def _read_run(self, path: Path) -> Iterator[tuple]:
+        """(sort key, raw fields) per row; fields are passed through without re-parsing"""
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            score_at, row_at, col_at = header.index(SCORE_COLUMN), header.index(ROW_COLUMN), header.index(COL_COLUMN)
+            for fields in reader:
+                yield (-float(fields[score_at]), int(fields[row_at]), int(fields[col_at])), fields
+
+    def _merge_into(self, runs: List[Path], path: Path, keep_positions: bool,
+                    on_row=None) -> int:
+        """k-way merge of sorted runs into one file"""
+        written = 0
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            header = self.columns + ([ROW_COLUMN, COL_COLUMN] if keep_positions else [])
+            writer.writerow(header)
+            merged = heapq.merge(*(self._read_run(run) for run in runs), key=lambda item: item[0])
+            width = len(header)
+            for _, fields in merged:
+                fields = fields[:width]
+                writer.writerow(fields)
+                if on_row is not None:
+                    on_row(fields)
+                written += 1
+        return written
+
+    def merge(self, output_path: PathLike, on_row=None) -> int:
+        """Merge every run into output_path (CSV) and return the number of rows written
+
+        on_row, if given, sees the raw fields of every output row (e.g. for
+        streaming summary counts).
+        """
+        runs = list(self.runs)
+        # Multi-pass merge keeps the number of simultaneously open files bounded
+        while len(runs) > self.max_open_runs:
+            group, runs = runs[:self.max_open_runs], runs[self.max_open_runs:]
+            merged = self._run_path()
+            self._merge_into(group, merged, keep_positions=True)
+            for run in group:
+                run.unlink()
+            runs.append(merged)
+
+        if self.columns is None:
+            pd.DataFrame().to_csv(output_path, index=False)
+            return 0
+        return self._merge_into(runs, Path(output_path), keep_positions=False, on_row=on_row)
+
+    def column_index(self, name: str) -> int:
+        """Position of a column in the merged output"""
+        return self.columns.index(name)
+
+    def cleanup(self):
+        """Remove spilled runs (and the directory if the spiller created it)"""
+        for run in self.directory.glob("run_*.csv"):
+            run.unlink()
+        if self.owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def stats(self) -> Dict:
+        return {'runs': len(self.runs), 'rows_spilled': self.rows_spilled, 'directory': str(self.directory)}
@@ -0,0 +1,99 @@
+"""
+Abbreviation and synonym expansion for procurement text
+"""
+
+from functools import lru_cache
+from typing import Dict, Optional
+
+import pandas as pd
+
+# Lowercase abbreviations, applied to cleaned tokens. Only unambiguous ones: e.g. 'sup'
+# (supplies/support/superintendent) and 'PC' (computer/professional corporation) are left out
+DEFAULT_SYNONYMS = {
+    'svc': 'service',
+    'svcs': 'services',
+    'srvc': 'service',
+    'srvcs': 'services',
+    'maint': 'maintenance',
+    'mnt': 'maintenance',
+    'equip': 'equipment',
+    'eqpt': 'equipment',
+    'eqp': 'equipment',
+    'supp': 'supplies',
+    'mgmt': 'management',
+    'mgt': 'management',
+    'consult': 'consulting',
+    'constr': 'construction',
+    'lab': 'laboratory',
+    'tech': 'technology',
+    'univ': 'university',
+    'misc': 'miscellaneous',
+    'rpr': 'repair',
+    'transp': 'transportation',
+    'mktg': 'marketing',
+    'prtg': 'printing',
+    'furn': 'furniture',
+    'clng': 'cleaning',
+    'janit': 'janitorial',
+}
+
+# Case-sensitive acronyms, applied before lowercasing ("IT" but not "it")
+DEFAULT_ACRONYMS = {
+    'IT': 'information technology',
+    'HVAC': 'heating ventilation air conditioning',
+    'AV': 'audio visual',
+}
+
+DEFAULT_CACHE_SIZE = 65536
+
+
+class SynonymNormalizer:
+    """Expands abbreviations through one token -> expansion dict with a bounded LRU cache
+
+    Acronyms are matched on the original casing ("IT" but not "it") and
+    abbreviations on the lowercased token, so both collapse into a single
+    cached lookup per token that also does the lowercasing.
+    """
+
+    def __init__(self, synonyms: Optional[Dict[str, str]] = None,
+                 acronyms: Optional[Dict[str, str]] = None, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.synonyms = {k.lower(): v.lower() for k, v in (DEFAULT_SYNONYMS if synonyms is None else synonyms).items()}
+        self.acronyms = {k: v.lower() for k, v in (DEFAULT_ACRONYMS if acronyms is None else acronyms).items()}
+        self.normalize_token = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _lookup(self, token: str) -> str:
+        """Lowercased expansion of one token, or the lowercased token itself"""
+        expansion = self.acronyms.get(token)
+        if expansion is not None:
+            return expansion
+        token = token.lower()
+        return self.synonyms.get(token, token)
+
+    def normalize_text(self, text: str) -> str:
+        """Lowercase and expand whitespace-separated text (punctuation already stripped)"""
+        return ' '.join(map(self.normalize_token, text.split()))
+
+    def cache_info(self) -> Dict[str, int]:
+        """Hit/miss counts of the per-token cache"""
+        info = self.normalize_token.cache_info()
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+
+    @classmethod
+    def from_csv(cls, csv_path: str, **kwargs) -> 'SynonymNormalizer':
+        """Load a dictionary CSV with term and expansion columns
+
+        Terms written entirely in uppercase are treated as case-sensitive acronyms.
+        """
+        df = pd.read_csv(csv_path, keep_default_na=False)
+        for col in ['term', 'expansion']:
+            if col not in df.columns:
+                raise ValueError(f"Missing required column in {csv_path}: {col}")
+
+        synonyms, acronyms = dict(DEFAULT_SYNONYMS), dict(DEFAULT_ACRONYMS)
+        for term, expansion in zip(df['term'], df['expansion']):
+            term = str(term).strip()
+            if term.isupper():
+                acronyms[term] = str(expansion)
+            else:
+                synonyms[term.lower()] = str(expansion)
+        return cls(synonyms=synonyms, acronyms=acronyms, **kwargs)
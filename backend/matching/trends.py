@@ -0,0 +1,137 @@
+"""
+Per-month purchase aggregates with month-over-month and rolling-window small-business shares
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+ORDER_DATE_COLUMN = 'Order Date'
+ORDER_DATE_FORMAT = '%m/%d/%Y'  # 01/31/2023, as in the purchase exports
+DEFAULT_WINDOW = 12  # months
+
+# Sums kept per month, in this order
+FIELDS = ['pos', 'small_business_pos', 'spend', 'small_business_spend']
+
+
+def parse_order_dates(values: pd.Series) -> pd.Series:
+    """Dates in the export format, falling back to pandas' parser for other layouts; NaT when unparseable"""
+    dates = pd.to_datetime(values, format=ORDER_DATE_FORMAT, errors='coerce')
+    retry = dates.isna() & values.notna()
+    if retry.any():
+        dates[retry] = pd.to_datetime(values[retry].astype(str), errors='coerce', format='mixed')
+    return dates
+
+
+class TrendTracker:
+    """Monthly totals plus trailing-window totals, both updated by deltas as purchases arrive
+
+    Adding purchases for a month changes that month's totals and the
+    windows that contain it (the month and the window - 1 after it), so
+    each batch costs O(months touched * window) whatever the history
+    length. Months with no purchases count as zeros.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        if window < 1:
+            raise ValueError("window must be at least one month")
+        self.window = window
+        self.totals: Dict[pd.Period, np.ndarray] = {}
+        self.rolling: Dict[pd.Period, np.ndarray] = {}  # every month from the first to the last
+        self.undated = 0
+
+    def __len__(self) -> int:
+        return len(self.totals)
+
+    def add(self, dates: pd.Series, is_small_business, amounts=None) -> List[pd.Period]:
+        """Count a batch of purchases; returns the months it touched"""
+        dates = pd.to_datetime(pd.Series(dates), errors='coerce')
+        flags = np.asarray(is_small_business, dtype=bool)
+        spend = np.zeros(len(dates)) if amounts is None else np.nan_to_num(np.asarray(amounts, dtype=float))
+        dated = dates.notna().to_numpy()
+        self.undated += int((~dated).sum())
+        if not dated.any():
+            return []
+
+        batch = pd.DataFrame({
+            'period': dates[dated].dt.to_period('M').to_numpy(),
+            'pos': 1,
+            'small_business_pos': flags[dated].astype(int),
+            'spend': spend[dated],
+            'small_business_spend': np.where(flags[dated], spend[dated], 0.0)
+        }).groupby('period', sort=True)[FIELDS].sum()
+
+        for period, delta in zip(batch.index, batch.to_numpy(dtype=float)):
+            self._apply(period, delta)
+        return list(batch.index)
+
+    def _apply(self, period: pd.Period, delta: np.ndarray):
+        """Add one month's delta to its totals and to every window containing it"""
+        zeros = np.zeros(len(FIELDS))
+        if not self.rolling:
+            self.rolling[period] = zeros.copy()
+        first, last = min(self.rolling), max(self.rolling)
+        # Months before the first seen have empty windows so far
+        month = first - 1
+        while month >= period:
+            self.rolling[month] = zeros.copy()
+            month -= 1
+        # New months after the last: slide the previous window by one month
+        month = last + 1
+        while month <= period:
+            self.rolling[month] = (self.rolling[month - 1] + self.totals.get(month, zeros)
+                                   - self.totals.get(month - self.window, zeros))
+            month += 1
+
+        self.totals[period] = self.totals.get(period, zeros) + delta
+        last = max(self.rolling)
+        month = period
+        while month <= last and month < period + self.window:
+            self.rolling[month] = self.rolling[month] + delta
+            month += 1
+
+    def monthly(self) -> pd.DataFrame:
+        """One row per calendar month (gaps included) with small-business shares and their change"""
+        if not self.rolling:
+            return pd.DataFrame(columns=['period'] + FIELDS)
+        periods = sorted(self.rolling)
+        zeros = np.zeros(len(FIELDS))
+        frame = pd.DataFrame([self.totals.get(period, zeros) for period in periods], columns=FIELDS)
+        frame.insert(0, 'period', [str(period) for period in periods])
+        frame[['pos', 'small_business_pos']] = frame[['pos', 'small_business_pos']].astype(int)
+        frame['small_business_percentage'] = _percentage(frame['small_business_pos'], frame['pos'])
+        frame['spend_percentage'] = _percentage(frame['small_business_spend'], frame['spend'])
+        # Percentage-point change from the previous month (NaN after a month with no purchases)
+        frame['percentage_change'] = frame['small_business_percentage'].diff()
+        frame['spend_percentage_change'] = frame['spend_percentage'].diff()
+        return frame
+
+    def rolling_windows(self) -> pd.DataFrame:
+        """Trailing-window totals and shares ending at each month"""
+        if not self.rolling:
+            return pd.DataFrame(columns=['period'] + FIELDS)
+        periods = sorted(self.rolling)
+        frame = pd.DataFrame([self.rolling[period] for period in periods], columns=FIELDS)
+        frame.insert(0, 'period', [str(period) for period in periods])
+        frame[['pos', 'small_business_pos']] = frame[['pos', 'small_business_pos']].astype(int)
+        # Windows near the start cover fewer months of history
+        frame['months'] = np.minimum(np.arange(1, len(periods) + 1), self.window)
+        frame['small_business_percentage'] = _percentage(frame['small_business_pos'], frame['pos'])
+        frame['spend_percentage'] = _percentage(frame['small_business_spend'], frame['spend'])
+        return frame
+
+    def table(self) -> pd.DataFrame:
+        """Monthly figures next to the trailing window ending at each month"""
+        monthly = self.monthly()
+        rolling = self.rolling_windows().drop(columns=['months'], errors='ignore')
+        return monthly.merge(rolling, on='period', suffixes=('', f'_rolling_{self.window}m'))
+
+    def latest(self) -> Optional[Dict]:
+        """The most recent month's figures and its trailing window"""
+        table = self.table()
+        return table.iloc[-1].to_dict() if len(table) else None
+
+
+def _percentage(part: pd.Series, whole: pd.Series) -> pd.Series:
+    return (part / whole.where(whole != 0) * 100).astype(float)
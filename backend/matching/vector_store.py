@@ -0,0 +1,188 @@
+"""
+On-disk layout for TF-IDF models and sparse vector matrices
+
+A model directory looks like this:
+
+    model_dir/
+        manifest.json            # format version, vectorizer params, matrix shapes
+        vocabulary.npy           # terms ordered by column index
+        idf.npy                  # IDF weight per column
+        df.npy                   # document frequency per column (for incremental updates)
+        registry.csv             # registry rows aligned with the registry matrix
+        registry/data.npy        # CSR arrays of the registry matrix
+        registry/indices.npy
+        registry/indptr.npy
+
+Every array is a flat .npy file so it can be opened with mmap_mode='r' and
+shared through the page cache by every process that loads the same model.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+# Vectorizer settings that are persisted alongside the vocabulary and IDF
+VECTORIZER_PARAMS = [
+    'lowercase', 'stop_words', 'ngram_range', 'max_features', 'min_df', 'max_df',
+    'norm', 'use_idf', 'smooth_idf', 'sublinear_tf'
+]
+
+PathLike = Union[str, Path]
+
+
+def save_csr(directory: PathLike, matrix: sp.spmatrix) -> Dict:
+    """Write a sparse matrix as flat data/indices/indptr .npy files"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    matrix = sp.csr_matrix(matrix)
+    matrix.sort_indices()
+
+    np.save(directory / "data.npy", np.ascontiguousarray(matrix.data))
+    np.save(directory / "indices.npy", np.ascontiguousarray(matrix.indices))
+    np.save(directory / "indptr.npy", np.ascontiguousarray(matrix.indptr))
+
+    return {
+        'shape': [int(matrix.shape[0]), int(matrix.shape[1])],
+        'nnz': int(matrix.nnz),
+        'dtype': str(matrix.data.dtype)
+    }
+
+
+def load_csr(directory: PathLike, shape, mmap: bool = True) -> sp.csr_matrix:
+    """Open a sparse matrix written by save_csr, memory-mapped by default"""
+    directory = Path(directory)
+    mmap_mode = 'r' if mmap else None
+
+    data = np.load(directory / "data.npy", mmap_mode=mmap_mode)
+    indices = np.load(directory / "indices.npy", mmap_mode=mmap_mode)
+    indptr = np.load(directory / "indptr.npy", mmap_mode=mmap_mode)
+
+    # copy=False keeps the arrays backed by the mapped files
+    return sp.csr_matrix((data, indices, indptr), shape=tuple(shape), copy=False)
+
+
+def save_vectorizer(directory: PathLike, vectorizer: TfidfVectorizer,
+                    document_frequency: Optional[np.ndarray] = None,
+                    n_documents: Optional[int] = None) -> Dict:
+    """Write the vocabulary and IDF of a fitted vectorizer as .npy files"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    terms = vectorizer.get_feature_names_out()
+    np.save(directory / "vocabulary.npy", np.asarray(terms, dtype=str))
+    np.save(directory / "idf.npy", np.ascontiguousarray(vectorizer.idf_))
+
+    params = {}
+    for name in VECTORIZER_PARAMS:
+        value = getattr(vectorizer, name)
+        params[name] = list(value) if isinstance(value, tuple) else value
+
+    info = {'params': params, 'n_features': int(len(terms))}
+    if document_frequency is not None:
+        np.save(directory / "df.npy", np.asarray(document_frequency, dtype=np.int64))
+        info['n_documents'] = int(n_documents)
+    return info
+
+
+def load_vectorizer(directory: PathLike, manifest: Dict, mmap: bool = True) -> TfidfVectorizer:
+    """Rebuild a frozen TfidfVectorizer from its persisted vocabulary and IDF"""
+    directory = Path(directory)
+    mmap_mode = 'r' if mmap else None
+
+    params = dict(manifest['vectorizer']['params'])
+    params['ngram_range'] = tuple(params['ngram_range'])
+    vectorizer = TfidfVectorizer(**params)
+
+    terms = np.load(directory / "vocabulary.npy", mmap_mode=mmap_mode)
+    vectorizer.vocabulary_ = {str(term): index for index, term in enumerate(terms)}
+    vectorizer.idf_ = np.load(directory / "idf.npy", mmap_mode=mmap_mode)
+    return vectorizer
+
+
+def save_model(model_dir: PathLike, vectorizer: TfidfVectorizer,
+               registry_vectors: sp.spmatrix, registry_df: pd.DataFrame,
+               document_frequency: Optional[np.ndarray] = None,
+               n_documents: Optional[int] = None, revision: int = 0) -> Dict:
+    """Persist a fitted vectorizer and registry matrix in the flat .npy layout"""
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+
+    if registry_vectors.shape[0] != len(registry_df):
+        raise ValueError(
+            f"Registry matrix has {registry_vectors.shape[0]} rows but registry has {len(registry_df)}"
+        )
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'created': pd.Timestamp.now().isoformat(),
+        'revision': revision,
+        'vectorizer': save_vectorizer(model_dir, vectorizer, document_frequency, n_documents),
+        'registry': save_csr(model_dir / "registry", registry_vectors)
+    }
+    registry_df.to_csv(model_dir / "registry.csv", index=False)
+
+    with open(model_dir / MANIFEST_FILE, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+def read_manifest(model_dir: PathLike) -> Dict:
+    """Read and validate a model manifest"""
+    manifest_path = Path(model_dir) / MANIFEST_FILE
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"No model manifest found at {manifest_path}")
+
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model format version: {manifest.get('format_version')}")
+    return manifest
+
+
+class VectorStore:
+    """Read-only view of a persisted model, backed by memory-mapped arrays"""
+
+    def __init__(self, model_dir: PathLike, mmap: bool = True):
+        self.model_dir = Path(model_dir)
+        self.manifest = read_manifest(self.model_dir)
+        self.vectorizer = load_vectorizer(self.model_dir, self.manifest, mmap=mmap)
+        self.registry_vectors = load_csr(
+            self.model_dir / "registry", self.manifest['registry']['shape'], mmap=mmap
+        )
+        self.registry_df = pd.read_csv(self.model_dir / "registry.csv", keep_default_na=False)
+
+        # Corpus statistics are only present for models saved with them
+        self.n_documents = self.manifest['vectorizer'].get('n_documents')
+        self.document_frequency = None
+        if self.n_documents is not None:
+            self.document_frequency = np.load(self.model_dir / "df.npy", mmap_mode='r' if mmap else None)
+        self.revision = self.manifest.get('revision', 0)
+
+    def load_matrix(self, name: str, mmap: bool = True) -> Optional[sp.csr_matrix]:
+        """Open an additional matrix stored under the model directory"""
+        info = self.manifest.get('matrices', {}).get(name)
+        if info is None:
+            return None
+        return load_csr(self.model_dir / name, info['shape'], mmap=mmap)
+
+    def save_matrix(self, name: str, matrix: sp.spmatrix) -> Dict:
+        """Store an additional matrix (e.g. purchase vectors) next to the registry"""
+        if matrix.shape[1] != self.registry_vectors.shape[1]:
+            raise ValueError("Matrix does not share the model vocabulary")
+
+        info = save_csr(self.model_dir / name, matrix)
+        self.manifest.setdefault('matrices', {})[name] = info
+        with open(self.model_dir / MANIFEST_FILE, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        return info
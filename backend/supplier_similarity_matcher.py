@@ -1,39 +1,156 @@
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.preprocessing import normalize
 import re
 import json
-from typing import Dict, List, Tuple
+import importlib.util
+import hashlib
+import signal
+import sys
+import argparse
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 import logging
 
+from matching.bm25 import DEFAULT_B, DEFAULT_BM25_THRESHOLD, DEFAULT_K1, BM25Scorer
+from matching.categories import CategoryClassifier
+from matching.checkpoint import RunCheckpoint, run_fingerprint
+from matching.blocking import (
+    business_spend_masks, compatible_pairs, plan_blocks, purchase_spend_masks, score_blocked
+)
+from matching.engine import DEFAULT_CHUNK_SIZE, prepare_registry, score_blocks, select_top_k
+from matching.evaluation import evaluate_modes
+from matching.incremental import DEFAULT_IDF_TOLERANCE, IncrementalRegistry, document_frequency_of
+from matching.instrumentation import RunProfiler, report_path_for
+from matching.ngram_profiler import DEFAULT_TOLERANCE, profile_ngram_configs, suggest_config
+from matching.progress import CancellationToken, MatchCancelled, ProgressCallback, ProgressTracker
+from matching.reverse_index import BusinessPurchaseIndex
+from matching.run_diff import content_hashes, diff_runs, format_ids
+from matching.score_cache import DEFAULT_MAX_DESCRIPTIONS, ScoreCache, model_version, text_hashes
+from matching.sharding import SHARD_STRATEGIES, ShardedRegistry
+from matching.small_business import flag_small_business
+from matching.spill import MatchSpiller
+from matching.synonyms import SynonymNormalizer
+from matching.trends import ORDER_DATE_COLUMN, TrendTracker, parse_order_dates
+from matching.vector_store import VectorStore, save_model
+
+AMOUNT_COLUMNS = ['Goods (Amt)', 'Services (Amt)', 'Construction (Amt)', 'IT (Amt)']
+OUTPUT_FORMATS = ['csv', 'json', 'parquet']
+# pandas needs one of these to write parquet
+PARQUET_ENGINES = ['pyarrow', 'fastparquet']
+# Purchase fields hashed into the stable PurchaseID of a match
+PURCHASE_ID_COLUMNS = ['Supplier Type', 'Supplier Name', 'Line Descr'] + AMOUNT_COLUMNS
+SCORING_MODES = ['cosine', 'bm25']
+# Minimum score per scoring mode when no threshold is given; the two scales differ
+DEFAULT_THRESHOLDS = {'cosine': 0.1, 'bm25': DEFAULT_BM25_THRESHOLD}
+# What to do with purchases whose current supplier is already a small business
+PREFILTER_MODES = ['drop', 'flag']
+
+DEFAULT_VECTORIZER_PARAMS = {
+    'lowercase': True,
+    'stop_words': 'english',
+    'ngram_range': (1, 3),
+    'max_features': 10000,
+    'min_df': 1,
+    'max_df': 0.95
+}
+
+# Matcher configurations compared by the evaluation harness (--evaluate)
+MATCHER_MODES = {
+    'exact': {},
+    'top-5': {'top_k': 5},
+    'top-1': {'top_k': 1},
+    'threaded': {'n_jobs': 4, 'chunk_size': 2000},
+    'bm25': {'scoring': 'bm25'},
+    'blocked': {'blocking': True}
+}
+
+
+class SchemaError(ValueError):
+    """Raised when an input file is missing required columns"""
+
+
 class SupplierSimilarityMatcher:
-    def __init__(self, similarity_threshold: float = 0.1):
-        self.similarity_threshold = similarity_threshold
-        self.vectorizer = TfidfVectorizer(
-            lowercase=True,
-            stop_words='english',
-            ngram_range=(1, 3),
-            max_features=10000,
-            min_df=1,
-            max_df=0.95
+    def __init__(self, similarity_threshold: Optional[float] = None, top_k: Optional[int] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, n_jobs: int = 1, trace_memory: bool = False,
+                 idf_tolerance: float = DEFAULT_IDF_TOLERANCE, scoring: str = 'cosine',
+                 bm25_k1: float = DEFAULT_K1, bm25_b: float = DEFAULT_B,
+                 synonyms: Optional[SynonymNormalizer] = None, expand_synonyms: bool = False,
+                 blocking: bool = False, small_business_prefilter: Optional[str] = None,
+                 score_cache: Optional[ScoreCache] = None, shards: Optional[int] = None,
+                 shard_by: str = 'hash', vectorizer_params: Optional[Dict] = None):
+        if scoring not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode: {scoring}")
+        if small_business_prefilter not in PREFILTER_MODES + [None]:
+            raise ValueError(f"Unknown small business prefilter: {small_business_prefilter}")
+        if shards and (blocking or score_cache is not None):
+            raise ValueError("Registry shards cannot be combined with blocking or a score cache")
+        self.similarity_threshold = (
+            similarity_threshold if similarity_threshold is not None else DEFAULT_THRESHOLDS[scoring]
         )
+        self.scoring = scoring  # 'cosine' over TF-IDF, or 'bm25' over raw term counts
+        self.bm25_k1 = bm25_k1
+        self.bm25_b = bm25_b
+        # Opt-in abbreviation expansion ("svcs" -> "services") applied during preprocessing;
+        # it changes which pairs clear the threshold, so it is off unless asked for
+        self.synonyms = (synonyms or SynonymNormalizer()) if expand_synonyms or synonyms is not None else None
+        self.top_k = top_k  # keep only the best k businesses per purchase (None = all)
+        self.chunk_size = chunk_size
+        self.n_jobs = n_jobs
+        self.blocking = blocking  # only score businesses whose spend_types overlap the purchase's
+        # 'drop' removes current small-business purchases at load, 'flag' keeps them unscored
+        self.small_business_prefilter = small_business_prefilter
+        self.score_cache = score_cache  # persistent pair scores reused across runs
+        # Registry split into shards scored in parallel (None = one monolithic matrix)
+        self.shards = shards
+        self.shard_by = shard_by
+        self.sharded_registry = None
+        self.profiler = RunProfiler(trace_memory=trace_memory)
+        # vectorizer_params override the defaults, e.g. a config suggested by --profile-ngrams
+        self.vectorizer = TfidfVectorizer(**dict(DEFAULT_VECTORIZER_PARAMS, **(vectorizer_params or {})))
+        # Registry vectors from the last fit, or from a model opened with load_model
+        self.registry_vectors = None
+        self.registry_df = None
+        self.is_frozen = False
+        # Corpus statistics for incremental registry updates
+        self.document_frequency = None
+        self.n_documents = None
+        self.model_revision = 0
+        self.idf_tolerance = idf_tolerance
+        self.registry = None
+        # Sparse scores of the last find_matches call, used for the business index
+        self.last_run = None
+        self.category_classifier = CategoryClassifier()
+        # Monthly small-business share of every loaded purchase, before any prefilter
+        self.trends = TrendTracker()
         
     def preprocess_text(self, text: str) -> str:
         """Clean and preprocess text for better matching"""
         if pd.isna(text) or text is None:
             return ""
         
-        text = str(text).lower()
         # Remove special characters but keep spaces
-        text = re.sub(r'[^\w\s]', ' ', text)
-        # Remove extra whitespace
-        text = ' '.join(text.split())
-        return text
+        text = re.sub(r'[^\w\s]', ' ', str(text))
+        if self.synonyms is not None:
+            # Lowercases and expands abbreviations in one cached pass over the tokens
+            return self.synonyms.normalize_text(text)
+        # Lowercase and remove extra whitespace
+        return ' '.join(text.lower().split())
+    
+    def preprocess_series(self, texts: pd.Series) -> pd.Series:
+        """preprocess_text over a column, computed once per distinct value"""
+        codes, uniques = pd.factorize(texts.fillna("").astype(str))
+        cleaned = np.array([self.preprocess_text(text) for text in uniques], dtype=object)
+        return pd.Series(cleaned[codes] if len(codes) else [], index=texts.index, dtype=object)
     
     def load_purchase_data(self, csv_path: str) -> pd.DataFrame:
         """Load and preprocess purchase data"""
-        df = pd.read_csv(csv_path)
+        with self.profiler.stage('read_csv') as stage:
+            df = pd.read_csv(csv_path)
+            stage['rows_out'] = len(df)
+        self.profiler.metadata.setdefault('inputs', []).append(str(csv_path))
         
         # Clean column names
         df.columns = df.columns.str.strip()
@@ -42,145 +159,1034 @@ class SupplierSimilarityMatcher:
         required_cols = ['Supplier Type', 'Supplier Name', 'Line Descr']
         for col in required_cols:
             if col not in df.columns:
-                raise ValueError(f"Missing required column: {col}")
+                raise SchemaError(f"Missing required column in {csv_path}: {col}")
         
         # Add amount columns if they exist
-        amount_cols = ['Goods (Amt)', 'Services (Amt)', 'Construction (Amt)', 'IT (Amt)']
-        for col in amount_cols:
-            if col in df.columns:
-                # Clean currency formatting
-                df[col] = df[col].astype(str).str.replace(r'[\$,"]', '', regex=True)
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+        with self.profiler.stage('clean_amounts', rows_in=len(df)) as stage:
+            for col in AMOUNT_COLUMNS:
+                if col in df.columns:
+                    # Clean currency formatting
+                    df[col] = df[col].astype(str).str.replace(r'[\$,"]', '', regex=True)
+                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+            stage['rows_out'] = len(df)
+        
+        is_small_business = flag_small_business(df['Supplier Type'])
+        if ORDER_DATE_COLUMN in df.columns:
+            with self.profiler.stage('parse_dates', rows_in=len(df)) as stage:
+                df[ORDER_DATE_COLUMN] = parse_order_dates(df[ORDER_DATE_COLUMN])
+                self.trends.add(df[ORDER_DATE_COLUMN], is_small_business, self.total_amounts(df))
+                stage['rows_out'] = len(df)
+        
+        # Purchases already with a small business cannot gain from a match
+        if self.small_business_prefilter is not None:
+            with self.profiler.stage('prefilter_small_business', rows_in=len(df)) as stage:
+                if self.small_business_prefilter == 'drop':
+                    df = df[~is_small_business].copy()
+                else:
+                    df['IsCurrentSmallBusiness'] = is_small_business
+                self.profiler.increment('small_business_purchases', int(is_small_business.sum()))
+                stage['rows_out'] = len(df)
         
         # Preprocess text fields
-        df['processed_description'] = df['Line Descr'].apply(self.preprocess_text)
-        df['processed_supplier'] = df['Supplier Name'].apply(self.preprocess_text)
+        with self.profiler.stage('preprocess_text', rows_in=len(df)) as stage:
+            df['processed_description'] = self.preprocess_series(df['Line Descr'])
+            df['processed_supplier'] = self.preprocess_series(df['Supplier Name'])
+            stage['rows_out'] = len(df)
         
         return df
     
     def create_small_business_data(self) -> pd.DataFrame:
         """Create sample small business data (you'll replace with real data)"""
         sample_businesses = [
-            {"name": "Green Tech Solutions", "keywords": "solar panels renewable energy installation maintenance"},
-            {"name": "Local Office Supply Co", "keywords": "office supplies paper pens furniture desk chairs"},
-            {"name": "Community Catering Services", "keywords": "food catering meals breakfast lunch dinner events"},
-            {"name": "Eco-Friendly Cleaning", "keywords": "cleaning supplies janitorial maintenance eco friendly"},
-            {"name": "Tech Repair Specialists", "keywords": "computer repair IT services laptop desktop maintenance"},
-            {"name": "Local Transportation LLC", "keywords": "vehicle transportation fleet management logistics"},
-            {"name": "Small Biz Consulting", "keywords": "consulting services business advice management strategy"},
-            {"name": "Artisan Uniform Company", "keywords": "uniforms clothing workwear custom embroidery apparel"},
-            {"name": "Regional Lab Supplies", "keywords": "laboratory equipment chemicals testing supplies scientific"},
-            {"name": "Community Print Shop", "keywords": "printing services marketing materials brochures business cards"}
+            {"name": "Green Tech Solutions", "keywords": "solar panels renewable energy installation maintenance", "category": "Energy", "spend_types": "Goods;Services;Construction"},
+            {"name": "Local Office Supply Co", "keywords": "office supplies paper pens furniture desk chairs", "category": "Office Supplies", "spend_types": "Goods"},
+            {"name": "Community Catering Services", "keywords": "food catering meals breakfast lunch dinner events", "category": "Food/Catering", "spend_types": "Goods;Services"},
+            {"name": "Eco-Friendly Cleaning", "keywords": "cleaning supplies janitorial maintenance eco friendly", "category": "Cleaning", "spend_types": "Goods;Services"},
+            {"name": "Tech Repair Specialists", "keywords": "computer repair IT services laptop desktop maintenance", "category": "Technology", "spend_types": "Services;IT"},
+            {"name": "Local Transportation LLC", "keywords": "vehicle transportation fleet management logistics", "category": "Transportation", "spend_types": "Services"},
+            {"name": "Small Biz Consulting", "keywords": "consulting services business advice management strategy", "category": "Consulting", "spend_types": "Services"},
+            {"name": "Artisan Uniform Company", "keywords": "uniforms clothing workwear custom embroidery apparel", "category": "Apparel", "spend_types": "Goods"},
+            {"name": "Regional Lab Supplies", "keywords": "laboratory equipment chemicals testing supplies scientific", "category": "Laboratory", "spend_types": "Goods"},
+            {"name": "Community Print Shop", "keywords": "printing services marketing materials brochures business cards", "category": "Printing/Marketing", "spend_types": "Goods;Services"}
         ]
         
         df = pd.DataFrame(sample_businesses)
-        df['processed_keywords'] = df['keywords'].apply(self.preprocess_text)
+        df['processed_keywords'] = self.preprocess_series(df['keywords'])
         return df
     
-    def find_matches(self, purchase_df: pd.DataFrame, small_biz_df: pd.DataFrame) -> List[Dict]:
-        """Find similarity matches between purchases and small businesses"""
+    def load_small_business_data(self, csv_path: str) -> pd.DataFrame:
+        """Load a small business registry CSV with name and keywords (optional category, spend_types)"""
+        df = pd.read_csv(csv_path, keep_default_na=False)
+        df.columns = df.columns.str.strip()
         
-        # Combine all text for vectorization
-        purchase_texts = purchase_df['processed_description'].tolist()
-        small_biz_texts = small_biz_df['processed_keywords'].tolist()
+        for col in ['name', 'keywords']:
+            if col not in df.columns:
+                raise SchemaError(f"Missing required column in {csv_path}: {col}")
+        
+        df['processed_keywords'] = self.preprocess_series(df['keywords'])
+        return df
+    
+    def save_model(self, model_dir: str) -> Dict:
+        """Persist the fitted vectorizer and registry matrix as memory-mappable .npy files"""
+        if self.registry_vectors is None:
+            raise ValueError("No fitted model to save - run find_matches first")
+        return save_model(
+            model_dir, self.vectorizer, self.registry_vectors, self.registry_df,
+            document_frequency=self.document_frequency, n_documents=self.n_documents,
+            revision=self.model_revision
+        )
+    
+    def load_model(self, model_dir: str, mmap: bool = True):
+        """Open a saved model; the vectorizer is frozen and the registry matrix memory-mapped"""
+        store = VectorStore(model_dir, mmap=mmap)
+        self.vectorizer = store.vectorizer
+        self.registry_vectors = store.registry_vectors
+        self.registry_df = store.registry_df
+        self.document_frequency = store.document_frequency
+        self.n_documents = store.n_documents
+        self.model_revision = store.revision
+        self.registry = None
+        self.is_frozen = True
+        return store
+    
+    def _incremental_registry(self) -> IncrementalRegistry:
+        """Registry that tracks document frequencies across add/update/remove"""
+        if self.registry is None:
+            if self.registry_vectors is None or self.document_frequency is None:
+                raise ValueError("Incremental updates need a model fitted or saved with document frequencies")
+            self.registry = IncrementalRegistry(
+                self.vectorizer, self.registry_df, self.document_frequency, self.n_documents,
+                idf_tolerance=self.idf_tolerance, revision=self.model_revision
+            )
+        return self.registry
+    
+    def _apply_registry_change(self, change: Callable[[IncrementalRegistry], Dict]) -> Dict:
+        """Run an incremental registry change and adopt its vectors and statistics"""
+        with self.profiler.stage('registry_update') as stage:
+            registry = self._incremental_registry()
+            summary = change(registry)
+            self.registry_vectors = registry.vectors
+            self.registry_df = registry.registry_df
+            self.document_frequency = registry.document_frequency
+            self.n_documents = registry.n_documents
+            self.model_revision = registry.revision
+            # Later runs score against the updated registry without refitting
+            self.is_frozen = True
+            stage['rows_out'] = len(self.registry_df)
+        return summary
+    
+    def _with_processed_keywords(self, businesses: pd.DataFrame) -> pd.DataFrame:
+        """Registry rows with processed_keywords filled in"""
+        businesses = businesses.copy()
+        if 'processed_keywords' not in businesses.columns:
+            businesses['processed_keywords'] = self.preprocess_series(businesses['keywords'])
+        return businesses
+    
+    def add_businesses(self, businesses: pd.DataFrame) -> Dict:
+        """Register new small businesses against the frozen model, without a refit"""
+        businesses = self._with_processed_keywords(businesses)
+        return self._apply_registry_change(lambda registry: registry.add(businesses))
+    
+    def update_businesses(self, businesses: pd.DataFrame) -> Dict:
+        """Replace the keywords of registered businesses, matched by name"""
+        businesses = self._with_processed_keywords(businesses)
+        return self._apply_registry_change(lambda registry: registry.update(businesses))
+    
+    def remove_businesses(self, names: List[str]) -> Dict:
+        """Remove businesses from the registry"""
+        return self._apply_registry_change(lambda registry: registry.remove(names))
+    
+    def find_matches(self, purchase_df: pd.DataFrame, small_biz_df: Optional[pd.DataFrame] = None,
+                     progress: Optional[ProgressCallback] = None,
+                     cancel: Optional[CancellationToken] = None,
+                     checkpoint: Optional[RunCheckpoint] = None) -> List[Dict]:
+        """Find similarity matches between purchases and small businesses
+        
+        progress, if given, is called after every scored block with rows_done,
+        total_rows, pairs_scored, elapsed_seconds, rows_per_second,
+        pairs_per_second and eta_seconds. cancel is checked before every block;
+        once cancelled the run stops with MatchCancelled and returns nothing.
+        checkpoint, if given, commits every scored block to disk; rerunning with
+        the same inputs, model and settings resumes after the last committed
+        block and returns the same matches.
+        """
+        run = self.prepare_scoring(purchase_df, small_biz_df)
+        small_biz_df, scored_positions, blocks = run['small_biz_df'], run['scored_positions'], run['blocks']
+        total_rows, pairs_per_row = run['total_rows'], run['pairs_per_row']
+        
+        # Score purchases against the registry block by block
+        rows, cols, scores = [], [], []
+        with self.profiler.stage(f'{self.scoring}_similarity', rows_in=total_rows) as stage:
+            for _, _, block_rows, block_cols, block_scores in self.run_batches(run, progress, cancel, checkpoint):
+                rows.append(block_rows)
+                cols.append(block_cols)
+                scores.append(block_scores)
+            rows = np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+            cols = np.concatenate(cols) if cols else np.array([], dtype=np.int64)
+            scores = np.concatenate(scores) if scores else np.array([], dtype=np.float64)
+            if blocks is not None:
+                # Back to (purchase, business) order, as the unblocked path produces it
+                rows, cols, scores = select_top_k(rows, cols, scores, None)
+            stage['rows_out'] = len(scores)
+            stage['nnz'] = len(scores)
+        
+        if scored_positions is not None:
+            # Back to positions in the full purchase frame
+            rows = scored_positions[rows]
+        self.last_run = {
+            'rows': rows,
+            'cols': cols,
+            'scores': scores,
+            'shape': (len(purchase_df), pairs_per_row),
+            'small_biz_df': small_biz_df
+        }
         
-        all_texts = purchase_texts + small_biz_texts
+        with self.profiler.stage('extract_matches', rows_in=len(scores)) as stage:
+            matches = self.build_match_records(purchase_df, small_biz_df, rows, cols, scores,
+                                               self.match_columns(purchase_df, small_biz_df, run['categories']))
+            stage['rows_out'] = len(matches)
         
-        # Create TF-IDF vectors
-        tfidf_matrix = self.vectorizer.fit_transform(all_texts)
+        # Sort by similarity score descending
+        with self.profiler.stage('sort_matches', rows_in=len(matches)) as stage:
+            matches.sort(key=lambda x: x['SimilarityScore'], reverse=True)
+            stage['rows_out'] = len(matches)
+        self.profiler.increment('matches', len(matches))
+        return matches
+    
+    def find_matches_to_file(self, purchase_df: pd.DataFrame, output_path: str,
+                             small_biz_df: Optional[pd.DataFrame] = None, spill_dir: Optional[str] = None,
+                             progress: Optional[ProgressCallback] = None,
+                             cancel: Optional[CancellationToken] = None,
+                             checkpoint: Optional[RunCheckpoint] = None) -> Dict:
+        """Out-of-core find_matches: spill every scored batch as a sorted run, then merge to CSV
+        
+        Produces the same rows in the same order as find_matches + export_results,
+        while holding only one batch of matches in memory. Returns the match
+        summary counts. progress, cancel and checkpoint work as in find_matches; a
+        cancelled run removes its spilled runs and writes no output.
+        """
+        run = self.prepare_scoring(purchase_df, small_biz_df)
+        small_biz_df, scored_positions = run['small_biz_df'], run['scored_positions']
+        total_rows = run['total_rows']
+        self.last_run = None  # the full score arrays are exactly what this mode avoids keeping
+        # Whole-frame columns are computed once here, not once per batch
+        columns = self.match_columns(purchase_df, small_biz_df, run['categories'])
+        
+        spiller = MatchSpiller(spill_dir)
+        try:
+            with self.profiler.stage(f'{self.scoring}_similarity', rows_in=total_rows) as stage:
+                for _, _, rows, cols, scores in self.run_batches(run, progress, cancel, checkpoint):
+                    if scored_positions is not None:
+                        rows = scored_positions[rows]
+                    matches = self.build_match_frame(purchase_df, small_biz_df, rows, cols, scores, columns)
+                    spiller.add_run(matches, rows, cols)
+                stage['rows_out'] = spiller.rows_spilled
+                stage['runs'] = len(spiller.runs)
+            
+            summary = {'High': 0, 'Medium': 0, 'Low': 0}
+            with self.profiler.stage('merge_runs', rows_in=spiller.rows_spilled) as stage:
+                recommendation_at = spiller.column_index('Recommendation') if spiller.columns else None
+                
+                def count(fields: List[str]):
+                    summary[fields[recommendation_at]] += 1
+                
+                written = spiller.merge(output_path, on_row=count)
+                stage['rows_out'] = written
+                stage['runs'] = len(spiller.runs)
+        finally:
+            spiller.cleanup()
         
-        # Split matrices
-        purchase_vectors = tfidf_matrix[:len(purchase_texts)]
-        small_biz_vectors = tfidf_matrix[len(purchase_texts):]
+        self.profiler.increment('matches', written)
+        self.profiler.metadata['spill'] = spiller.stats()
+        summary['Total'] = written
+        return summary
+    
+    def prepare_scoring(self, purchase_df: pd.DataFrame, small_biz_df: Optional[pd.DataFrame] = None) -> Dict:
+        """Vectorize, categorize and plan a run; everything the scoring batches need"""
+        if small_biz_df is None and not self.is_frozen:
+            raise ValueError("small_biz_df is required unless a model is loaded")
         
-        # Calculate similarity matrix
-        similarity_matrix = cosine_similarity(purchase_vectors, small_biz_vectors)
+        # Flagged small-business purchases stay in the frame but are never vectorized or scored
+        scored_positions = None
+        scored_df = purchase_df
+        if self.small_business_prefilter == 'flag' and 'IsCurrentSmallBusiness' in purchase_df.columns:
+            scored_positions = np.flatnonzero(~purchase_df['IsCurrentSmallBusiness'].to_numpy(dtype=bool))
+            scored_df = purchase_df.iloc[scored_positions]
         
-        matches = []
+        # Combine all text for vectorization
+        purchase_texts = scored_df['processed_description'].tolist()
         
-        for i, purchase_row in purchase_df.iterrows():
-            for j, small_biz_row in small_biz_df.iterrows():
-                similarity_score = similarity_matrix[i, j]
+        with self.profiler.stage('vectorize', rows_in=len(purchase_texts)) as stage:
+            if self.is_frozen:
+                # Frozen model: only the purchases need vectorizing
+                purchase_vectors = self.vectorizer.transform(purchase_texts)
+                if small_biz_df is None:
+                    small_biz_df = self.registry_df
+                    small_biz_vectors = self.registry_vectors
+                else:
+                    small_biz_vectors = self.vectorizer.transform(small_biz_df['processed_keywords'].tolist())
+            else:
+                small_biz_texts = small_biz_df['processed_keywords'].tolist()
+                all_texts = purchase_texts + small_biz_texts
                 
-                if similarity_score >= self.similarity_threshold:
-                    # Calculate total amount for this purchase
-                    amount_cols = ['Goods (Amt)', 'Services (Amt)', 'Construction (Amt)', 'IT (Amt)']
-                    total_amount = 0
-                    for col in amount_cols:
-                        if col in purchase_df.columns:
-                            total_amount += abs(purchase_row.get(col, 0))
-                    
-                    # Determine recommendation level
-                    if similarity_score >= 0.3:
-                        recommendation = "High"
-                    elif similarity_score >= 0.2:
-                        recommendation = "Medium"
+                # Create TF-IDF vectors
+                tfidf_matrix = self.vectorizer.fit_transform(all_texts)
+                
+                # Split matrices
+                purchase_vectors = tfidf_matrix[:len(purchase_texts)]
+                small_biz_vectors = tfidf_matrix[len(purchase_texts):]
+                self.registry_vectors = small_biz_vectors
+                self.registry_df = small_biz_df
+                self.document_frequency = document_frequency_of(tfidf_matrix, tfidf_matrix.shape[1])
+                self.n_documents = len(all_texts)
+                self.model_revision = 0
+                self.registry = None
+            stage['rows_out'] = purchase_vectors.shape[0] + small_biz_vectors.shape[0]
+            stage['nnz'] = int(purchase_vectors.nnz + small_biz_vectors.nnz)
+            stage['vocabulary_size'] = len(self.vectorizer.vocabulary_)
+        
+        # Assign a business category to every purchase when the registry is labeled
+        categories = None
+        if 'category' in small_biz_df.columns:
+            with self.profiler.stage('categorize', rows_in=purchase_vectors.shape[0]) as stage:
+                self.category_classifier.fit(small_biz_vectors, small_biz_df['category'])
+                if self.category_classifier.fitted:
+                    labels, _ = self.category_classifier.predict(purchase_vectors, chunk_size=self.chunk_size)
+                    if scored_positions is not None:
+                        categories = np.full(len(purchase_df), None, dtype=object)
+                        categories[scored_positions] = labels
                     else:
-                        recommendation = "Low"
-                    
-                    match = {
-                        'MatchID': f"match_{i}_{j}",
-                        'CurrentSupplier': purchase_row['Supplier Name'],
-                        'CurrentSupplierType': purchase_row['Supplier Type'],
-                        'LineDescription': purchase_row['Line Descr'],
-                        'PurchaseAmount': total_amount,
-                        'SmallBusinessName': small_biz_row['name'],
-                        'SmallBusinessKeywords': small_biz_row['keywords'],
-                        'SimilarityScore': round(similarity_score, 4),
-                        'Recommendation': recommendation,
-                        'Timestamp': pd.Timestamp.now().isoformat()
-                    }
-                    matches.append(match)
+                        categories = labels
+                    stage['rows_out'] = len(labels)
+                else:
+                    self.profiler.metadata['categorize'] = "skipped: no labeled registry rows"
+                    stage['rows_out'] = 0
+                stage['categories'] = len(self.category_classifier.categories)
         
-        # Sort by similarity score descending
-        matches.sort(key=lambda x: x['SimilarityScore'], reverse=True)
-        return matches
+        total_rows = purchase_vectors.shape[0]
+        if self.scoring == 'bm25':
+            with self.profiler.stage('bm25_index', rows_in=total_rows) as stage:
+                counter = CountVectorizer(
+                    analyzer=self.vectorizer.build_analyzer(), vocabulary=self.vectorizer.vocabulary_
+                )
+                scorer = BM25Scorer(k1=self.bm25_k1, b=self.bm25_b)
+                scorer.fit(counter.transform(small_biz_df['processed_keywords'].tolist()))
+                query_vectors = scorer.query_vectors(counter.transform(purchase_texts))
+                registry_t = scorer.registry_t
+                stage['rows_out'] = query_vectors.shape[0]
+                stage['nnz'] = int(query_vectors.nnz + registry_t.nnz)
+        else:
+            query_vectors, registry_t = purchase_vectors, None
+        
+        blocks = self.plan_blocks(scored_df, small_biz_df) if self.blocking else None
+        
+        return {
+            'purchase_df': purchase_df,
+            'scored_positions': scored_positions,
+            'scored_df': scored_df,
+            'small_biz_df': small_biz_df,
+            'small_biz_vectors': small_biz_vectors,
+            'query_vectors': query_vectors,
+            'registry_t': registry_t,
+            'blocks': blocks,
+            'categories': categories,  # per purchase_df row, or None
+            'total_rows': total_rows,
+            'pairs_per_row': small_biz_vectors.shape[0]
+        }
+    
+    def score_batches(self, run: Dict, first_batch: int = 0) -> Iterator[Tuple]:
+        """(rows in batch, pairs scored, rows, cols, scores) per scored batch, in scored-row positions
+        
+        A generator on every path (the score cache yields its single batch), so
+        callers can pull batches one at a time and close an abandoned run.
+        Batches before first_batch (already done by a checkpointed run) are not scored.
+        """
+        scored_df, small_biz_df, blocks = run['scored_df'], run['small_biz_df'], run['blocks']
+        query_vectors, registry_t, small_biz_vectors = run['query_vectors'], run['registry_t'], run['small_biz_vectors']
+        total_rows, pairs_per_row = run['total_rows'], run['pairs_per_row']
+        offset = first_batch * self.chunk_size
+        if self.score_cache is not None:
+            # One pass over distinct descriptions; only pairs missing from the cache are computed
+            batches = [] if first_batch else [self.cached_scores(
+                scored_df, small_biz_df, query_vectors,
+                registry_t if registry_t is not None else prepare_registry(small_biz_vectors),
+                blocking=blocks is not None
+            )]
+        elif blocks is None and self.shards:
+            sharded = self.build_shards(small_biz_df, small_biz_vectors, registry_t)
+            batches = (
+                (min(offset + start + self.chunk_size, total_rows) - offset - start,
+                 (min(offset + start + self.chunk_size, total_rows) - offset - start) * pairs_per_row,
+                 block_rows + offset, block_cols, block_scores)
+                for start, block_rows, block_cols, block_scores in sharded.score(
+                    query_vectors[offset:], self.similarity_threshold, top_k=self.top_k,
+                    chunk_size=self.chunk_size, normalize_queries=self.scoring == 'cosine'
+                )
+            )
+        elif blocks is None:
+            batches = (
+                (min(offset + start + self.chunk_size, total_rows) - offset - start,
+                 (min(offset + start + self.chunk_size, total_rows) - offset - start) * pairs_per_row,
+                 block_rows + offset, block_cols, block_scores)
+                for start, block_rows, block_cols, block_scores in score_blocks(
+                    query_vectors[offset:], small_biz_vectors, self.similarity_threshold,
+                    top_k=self.top_k, chunk_size=self.chunk_size, n_jobs=self.n_jobs,
+                    registry_t=registry_t, normalize_queries=self.scoring == 'cosine'
+                )
+            )
+        else:
+            # Spend-type blocks are independent sub-problems, scored on the worker threads
+            batches = (
+                (len(block[0]), len(block[0]) * len(block[1]), block_rows, block_cols, block_scores)
+                for block, block_rows, block_cols, block_scores in score_blocked(
+                    query_vectors, registry_t if registry_t is not None else prepare_registry(small_biz_vectors),
+                    blocks[first_batch:], self.similarity_threshold, top_k=self.top_k, chunk_size=self.chunk_size,
+                    n_jobs=self.n_jobs, normalize_queries=self.scoring == 'cosine'
+                )
+            )
+        yield from batches
+    
+    def run_batches(self, run: Dict, progress: Optional[ProgressCallback] = None,
+                    cancel: Optional[CancellationToken] = None,
+                    checkpoint: Optional[RunCheckpoint] = None) -> Iterator[Tuple]:
+        """score_batches with a cancellation check before each batch and a progress report after it
+        
+        With a checkpoint, batches a previous run of the same inputs committed
+        are replayed from disk and every newly scored batch is committed.
+        """
+        tracker = ProgressTracker(run['total_rows'], progress)
+        first_batch = 0
+        if checkpoint is not None:
+            first_batch = checkpoint.start(self.run_fingerprint(run))
+            self.profiler.metadata['checkpoint'] = {
+                'directory': str(checkpoint.directory), 'resumed_batches': first_batch
+            }
+            for batch in checkpoint.restore():
+                yield batch
+                tracker.update(batch[0], batch[1])
+        
+        batches = self.score_batches(run, first_batch)
+        index = first_batch
+        try:
+            while True:
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                if checkpoint is not None:
+                    checkpoint.commit(index, batch)
+                index += 1
+                yield batch
+                tracker.update(batch[0], batch[1])
+        finally:
+            batches.close()  # stop worker threads of an abandoned run
+        if checkpoint is not None:
+            checkpoint.finish()
+        self.record_pairs(run, tracker.pairs_scored)
+    
+    def run_fingerprint(self, run: Dict) -> str:
+        """Identity of a run's scores: its vectors, blocks and scoring settings"""
+        config = {
+            'scoring': self.scoring,
+            'similarity_threshold': self.similarity_threshold,
+            'top_k': self.top_k,
+            'chunk_size': self.chunk_size,
+            'score_cache': self.score_cache is not None
+        }
+        blocks = run['blocks'] or []
+        return run_fingerprint(
+            config, run['query_vectors'],
+            run['registry_t'] if run['registry_t'] is not None else run['small_biz_vectors'],
+            *(part for block in blocks for part in block)
+        )
+    
+    def record_pairs(self, run: Dict, pairs_done: int):
+        """Scored and skipped pair counters for a finished run"""
+        self.profiler.increment('pairs_scored', pairs_done)
+        self.profiler.increment('pairs_skipped', run['total_rows'] * run['pairs_per_row'] - pairs_done)
+        if self.small_business_prefilter is not None:
+            self.profiler.metadata['small_business_pairs_saved'] = (
+                self.profiler.counters.get('small_business_purchases', 0) * run['pairs_per_row']
+            )
     
-    def export_results(self, matches: List[Dict], output_path: str):
-        """Export matches to CSV"""
-        df = pd.DataFrame(matches)
-        df.to_csv(output_path, index=False)
+    def build_shards(self, small_biz_df: pd.DataFrame, small_biz_vectors: sp.spmatrix,
+                     registry_t: Optional[sp.spmatrix] = None) -> ShardedRegistry:
+        """Shard the registry, rebuilding only the shards whose businesses changed since the last run"""
+        if self.sharded_registry is None:
+            self.sharded_registry = ShardedRegistry(self.shards, by=self.shard_by, n_jobs=self.n_jobs)
+        with self.profiler.stage('build_shards', rows_in=len(small_biz_df)) as stage:
+            if registry_t is None:
+                rebuilt = self.sharded_registry.build(small_biz_vectors, small_biz_df)
+            else:
+                # Scorer-specific weights (BM25) are used as they are
+                rebuilt = self.sharded_registry.build(registry_t.T, small_biz_df, normalize_rows=False)
+            stage['rows_out'] = len(self.sharded_registry.shards)
+            stage['rebuilt_shards'] = len(rebuilt)
+        self.profiler.metadata['shards'] = self.sharded_registry.shard_sizes()
+        return self.sharded_registry
+    
+    def cached_scores(self, purchase_df: pd.DataFrame, small_biz_df: pd.DataFrame,
+                      query_vectors: sp.spmatrix, registry_t: sp.spmatrix, blocking: bool = False) -> Tuple:
+        """Thresholded top-k scores through the persistent score cache
+        
+        Each distinct description is scored once against each distinct keyword
+        set, and only pairs the cache has not seen for this model version are
+        computed. Returns (rows, pairs computed, rows, cols, scores) like one
+        scoring batch.
+        """
+        desc_hashes, desc_first, desc_codes = np.unique(
+            text_hashes(purchase_df['processed_description']), return_index=True, return_inverse=True
+        )
+        biz_hashes, biz_first, biz_codes = np.unique(
+            text_hashes(small_biz_df['processed_keywords']), return_index=True, return_inverse=True
+        )
+        
+        # Only scores that can pass the threshold are stored, so it is part of the version
+        settings = {'scoring': self.scoring, 'min_score': self.similarity_threshold}
+        if self.scoring == 'bm25':
+            # BM25 weights depend on the whole registry (IDF, average length)
+            settings.update({'k1': self.bm25_k1, 'b': self.bm25_b,
+                             'registry': hashlib.sha1(biz_hashes.tobytes()).hexdigest()})
+        version = model_version(self.vectorizer, settings)
+        
+        queries = query_vectors[desc_first]
+        if self.scoring == 'cosine':
+            queries = normalize(queries)
+        registry_t = sp.csc_matrix(registry_t)[:, biz_first]
+        def compute(rows: np.ndarray, cols: np.ndarray) -> sp.csr_matrix:
+            block = sp.csr_matrix(queries[rows] @ registry_t[:, cols])
+            block.data[block.data < self.similarity_threshold] = 0
+            block.eliminate_zeros()
+            return block
+        
+        unique_scores = self.score_cache.scores(version, desc_hashes, biz_hashes, compute)
+        stats = self.score_cache.last_stats
+        self.profiler.metadata['score_cache'] = dict(stats, path=str(self.score_cache.path))
+        
+        # Broadcast distinct descriptions back to purchases and keyword sets back to businesses
+        n_businesses = len(biz_codes)
+        to_businesses = sp.csr_matrix(
+            (np.ones(n_businesses), (biz_codes, np.arange(n_businesses))), shape=(len(biz_hashes), n_businesses)
+        )
+        pairs = (unique_scores[desc_codes] @ to_businesses).tocoo()
+        keep = pairs.data >= self.similarity_threshold
+        rows, cols, scores = pairs.row[keep].astype(np.int64), pairs.col[keep].astype(np.int64), pairs.data[keep]
+        if blocking:
+            compatible = compatible_pairs(
+                purchase_spend_masks(purchase_df), business_spend_masks(small_biz_df['spend_types']), rows, cols
+            )
+            rows, cols, scores = rows[compatible], cols[compatible], scores[compatible]
+        rows, cols, scores = select_top_k(rows, cols, scores, self.top_k)
+        return len(purchase_df), stats['pairs_computed'], rows, cols, scores
+    
+    def plan_blocks(self, purchase_df: pd.DataFrame, small_biz_df: pd.DataFrame) -> Optional[List]:
+        """Spend-type blocks for this run, or None when the registry has no spend_types column"""
+        if 'spend_types' not in small_biz_df.columns:
+            self.profiler.metadata['blocking'] = "skipped: registry has no spend_types column"
+            return None
+        
+        with self.profiler.stage('plan_blocks', rows_in=len(purchase_df)) as stage:
+            blocks = plan_blocks(
+                purchase_spend_masks(purchase_df), business_spend_masks(small_biz_df['spend_types'])
+            )
+            stage['rows_out'] = len(blocks)
+        self.profiler.metadata['blocking'] = [
+            {'purchases': len(rows), 'businesses': len(cols)} for rows, cols in blocks
+        ]
+        return blocks
+    
+    def build_match_records(self, purchase_df: pd.DataFrame, small_biz_df: pd.DataFrame,
+                            rows: np.ndarray, cols: np.ndarray, scores: np.ndarray,
+                            columns: Optional[Dict] = None) -> List[Dict]:
+        """Turn (purchase position, business position, score) arrays into match dicts"""
+        return self.build_match_frame(purchase_df, small_biz_df, rows, cols, scores, columns).to_dict('records')
+    
+    def match_columns(self, purchase_df: pd.DataFrame, small_biz_df: pd.DataFrame,
+                      categories: Optional[np.ndarray] = None) -> Dict:
+        """Output columns derived from the whole purchase and business frames, indexed per match
+        
+        categories are the run's predicted purchase categories; without them a
+        Business_Category column already in purchase_df is used.
+        """
+        if categories is None and 'Business_Category' in purchase_df.columns:
+            categories = purchase_df['Business_Category'].to_numpy()
+        # Content-hash IDs that stay the same from run to run, for diffing runs
+        id_columns = [col for col in PURCHASE_ID_COLUMNS if col in purchase_df.columns]
+        # Plain arrays: to_numpy on a string column rescans the whole column every call
+        columns = {
+            'suppliers': purchase_df['Supplier Name'].to_numpy(),
+            'supplier_types': purchase_df['Supplier Type'].to_numpy(),
+            'descriptions': purchase_df['Line Descr'].to_numpy(),
+            'categories': categories,
+            'business_names': small_biz_df['name'].to_numpy(),
+            'business_keywords': small_biz_df['keywords'].to_numpy(),
+            'amounts': self.total_amounts(purchase_df),
+            'purchase_hashes': content_hashes(purchase_df, id_columns),
+            'business_hashes': content_hashes(small_biz_df, ['name']),
+            'order_dates': None
+        }
+        if ORDER_DATE_COLUMN in purchase_df.columns:
+            columns['order_dates'] = pd.to_datetime(purchase_df[ORDER_DATE_COLUMN]).dt.strftime('%Y-%m-%d').to_numpy()
+        return columns
+    
+    def build_match_frame(self, purchase_df: pd.DataFrame, small_biz_df: pd.DataFrame,
+                          rows: np.ndarray, cols: np.ndarray, scores: np.ndarray,
+                          columns: Optional[Dict] = None) -> pd.DataFrame:
+        """Match rows as a DataFrame, in the order of the given positions
+        
+        columns (from match_columns) saves recomputing them when one run builds many frames.
+        """
+        if columns is None:
+            columns = self.match_columns(purchase_df, small_biz_df)
+        
+        # Determine recommendation level
+        recommendations = np.select(
+            [scores >= 0.3, scores >= 0.2], ["High", "Medium"], default="Low"
+        )
+        
+        purchase_ids = purchase_df.index.to_numpy()[rows]
+        business_ids = small_biz_df.index.to_numpy()[cols]
+        records = pd.DataFrame({
+            'MatchID': [f"match_{i}_{j}" for i, j in zip(purchase_ids, business_ids)],
+            'CurrentSupplier': columns['suppliers'][rows],
+            'CurrentSupplierType': columns['supplier_types'][rows],
+            'LineDescription': columns['descriptions'][rows],
+            'PurchaseAmount': columns['amounts'][rows],
+            'SmallBusinessName': columns['business_names'][cols],
+            'SmallBusinessKeywords': columns['business_keywords'][cols],
+            'SimilarityScore': np.round(scores, 4),
+            'Recommendation': recommendations,
+            'Timestamp': pd.Timestamp.now().isoformat()
+        })
+        if columns['categories'] is not None:
+            records['BusinessCategory'] = columns['categories'][rows]
+        if columns['order_dates'] is not None:
+            records['OrderDate'] = columns['order_dates'][rows]
+        records['PurchaseID'] = format_ids(columns['purchase_hashes'][rows])
+        records['BusinessID'] = format_ids(columns['business_hashes'][cols])
+        return records
+    
+    def total_amounts(self, purchase_df: pd.DataFrame) -> np.ndarray:
+        """Absolute purchase amount per row, summed over the amount columns present"""
+        amount_cols = [col for col in AMOUNT_COLUMNS if col in purchase_df.columns]
+        if not amount_cols:
+            return np.zeros(len(purchase_df))
+        return purchase_df[amount_cols].abs().sum(axis=1).to_numpy()
+    
+    def build_business_index(self, purchase_df: pd.DataFrame, top_n: int = 50) -> BusinessPurchaseIndex:
+        """Top-N purchases per small business from the scores of the last find_matches run
+        
+        With top_k set, only purchases that kept a business in their own top k
+        can appear in that business's list.
+        """
+        if self.last_run is None:
+            raise ValueError("No similarity run to index - run find_matches first")
+        if len(purchase_df) != self.last_run['shape'][0]:
+            raise ValueError("purchase_df does not match the last similarity run")
+        
+        with self.profiler.stage('business_index', rows_in=len(self.last_run['scores'])) as stage:
+            score_matrix = sp.csc_matrix(
+                (self.last_run['scores'], (self.last_run['rows'], self.last_run['cols'])),
+                shape=self.last_run['shape']
+            )
+            index = BusinessPurchaseIndex.build(
+                score_matrix, purchase_df, self.last_run['small_biz_df']['name'].tolist(),
+                self.total_amounts(purchase_df), top_n=top_n
+            )
+            stage['rows_out'] = len(index.purchase_rows)
+        return index
+    
+    def get_run_report(self) -> Dict:
+        """Per-stage timings and counters recorded so far"""
+        report = self.profiler.report()
+        report['similarity_threshold'] = self.similarity_threshold
+        return report
+    
+    def export_results(self, matches: List[Dict], output_path: str, output_format: Optional[str] = None):
+        """Export matches (CSV by default), with a JSON run report written next to it"""
+        output_format = output_format or Path(output_path).suffix.lstrip('.').lower() or 'csv'
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        
+        with self.profiler.stage('export', rows_in=len(matches)) as stage:
+            df = pd.DataFrame(matches)
+            if output_format == 'json':
+                df.to_json(output_path, orient='records', indent=2)
+            elif output_format == 'parquet':
+                df.to_parquet(output_path, index=False)
+            else:
+                df.to_csv(output_path, index=False)
+            stage['rows_out'] = len(df)
         print(f"Exported {len(matches)} matches to {output_path}")
+        self.write_run_report(output_path)
         
         # Print summary
-        high_matches = len([m for m in matches if m['Recommendation'] == 'High'])
-        medium_matches = len([m for m in matches if m['Recommendation'] == 'Medium'])
-        low_matches = len([m for m in matches if m['Recommendation'] == 'Low'])
-        
+        self.print_match_summary({
+            'High': len([m for m in matches if m['Recommendation'] == 'High']),
+            'Medium': len([m for m in matches if m['Recommendation'] == 'Medium']),
+            'Low': len([m for m in matches if m['Recommendation'] == 'Low']),
+            'Total': len(matches)
+        })
+    
+    def write_run_report(self, output_path: str):
+        """JSON run report next to an exported output"""
+        self.profiler.metadata['output'] = str(output_path)
+        if self.synonyms is not None:
+            self.profiler.metadata['synonym_cache'] = self.synonyms.cache_info()
+        report_path = report_path_for(output_path)
+        self.profiler.write_report(report_path)
+        print(f"Run report written to {report_path}")
+    
+    @staticmethod
+    def print_match_summary(summary: Dict[str, int]):
+        """Match counts per recommendation level"""
         print(f"\nMatch Summary:")
-        print(f"High confidence: {high_matches}")
-        print(f"Medium confidence: {medium_matches}")
-        print(f"Low confidence: {low_matches}")
-        print(f"Total matches: {len(matches)}")
+        print(f"High confidence: {summary['High']}")
+        print(f"Medium confidence: {summary['Medium']}")
+        print(f"Low confidence: {summary['Low']}")
+        print(f"Total matches: {summary['Total']}")
 
-def main():
-    """Main execution function"""
-    matcher = SupplierSimilarityMatcher(similarity_threshold=0.1)
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_SCHEMA_ERROR = 3
+EXIT_CANCELLED = 130
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Command-line options for batch matching runs"""
+    parser = argparse.ArgumentParser(
+        description="Match purchase lines to certified small businesses using TF-IDF similarity"
+    )
+    parser.add_argument('inputs', nargs='*', default=["slo purchases data.csv"],
+                        help="Purchase CSV file(s) to match")
+    parser.add_argument('--registry', help="Small business registry CSV (name, keywords); "
+                                           "defaults to the model registry or the built-in sample")
+    parser.add_argument('--output', '-o', default="supplier_matches.csv", help="Output file path")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS,
+                        help="Output format (inferred from the output extension by default)")
+    parser.add_argument('--threshold', type=float,
+                        help=f"Minimum similarity score (default: {DEFAULT_THRESHOLDS['cosine']} for cosine, "
+                             f"{DEFAULT_THRESHOLDS['bm25']} for bm25)")
+    parser.add_argument('--scoring', choices=SCORING_MODES, default='cosine', help="Similarity scoring mode")
+    parser.add_argument('--bm25-k1', type=float, default=DEFAULT_K1, help="BM25 term-frequency saturation")
+    parser.add_argument('--bm25-b', type=float, default=DEFAULT_B, help="BM25 document-length normalization")
+    parser.add_argument('--synonyms', metavar='CSV',
+                        help="Extra abbreviation dictionary (term, expansion) merged with the built-in one; "
+                             "implies --expand-synonyms")
+    parser.add_argument('--expand-synonyms', action='store_true',
+                        help="Expand abbreviations (\"svcs\" -> \"services\", \"IT\" -> \"information technology\") "
+                             "before matching; changes the match output (more or fewer pairs clear the threshold)")
+    parser.add_argument('--no-synonyms', action='store_true',
+                        help="No abbreviation expansion (the default; overrides --expand-synonyms)")
+    parser.add_argument('--blocking', action='store_true',
+                        help="Score purchases only against businesses serving the same spend types "
+                             "(registry spend_types column, e.g. \"Goods;Services\")")
+    parser.add_argument('--small-business', choices=PREFILTER_MODES,
+                        help="Drop, or flag and skip, purchases whose current supplier is already a small business")
+    parser.add_argument('--score-cache', metavar='SQLITE_PATH',
+                        help="Persistent pair-score cache; repeated runs only score pairs it has not seen")
+    parser.add_argument('--cache-max-descriptions', type=int, default=DEFAULT_MAX_DESCRIPTIONS,
+                        help="Least recently used descriptions beyond this are evicted from the score cache")
+    parser.add_argument('--cache-ttl-days', type=float, help="Evict cached scores older than this many days")
+    parser.add_argument('--shards', type=int,
+                        help="Split the registry into this many shards, scored in parallel with --workers "
+                             "(not with --blocking or --score-cache)")
+    parser.add_argument('--shard-by', choices=SHARD_STRATEGIES, default='hash',
+                        help="Assign businesses to shards by name hash or by registry category")
+    parser.add_argument('--top-k', type=int, help="Keep only the best k businesses per purchase")
+    parser.add_argument('--workers', type=int, default=1, help="Worker threads for scoring blocks")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Purchase rows scored per block")
+    parser.add_argument('--model', help="Saved model directory to load (frozen vectorizer and registry)")
+    parser.add_argument('--add-businesses', help="Registry CSV of new businesses to add to the loaded model "
+                                                 "without refitting")
+    parser.add_argument('--save-model', help="Directory to save the fitted model to")
+    parser.add_argument('--business-index', help="Directory to write the per-business top purchases index to")
+    parser.add_argument('--index-top-n', type=int, default=50, help="Purchases kept per business in the index")
+    parser.add_argument('--evaluate', metavar='LABELS_CSV',
+                        help="Compare all matcher modes against labeled pairs (PurchaseRow, SmallBusinessName) "
+                             "instead of running a single match")
+    parser.add_argument('--profile-ngrams', action='store_true',
+                        help="Sweep n-gram range, max_features and min_df on the input data, report cost "
+                             "and top-k agreement with the current settings, and suggest the smallest")
+    parser.add_argument('--ngram-tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Largest top-k agreement loss a suggested configuration may have")
+    parser.add_argument('--ngram-memory', action='store_true',
+                        help="Also measure peak fit memory per configuration (a traced re-fit, much slower)")
+    parser.add_argument('--ngram-range', type=parse_ngram_range, help="Vectorizer n-gram range, e.g. 1-2")
+    parser.add_argument('--max-features', type=int, help="Vectorizer vocabulary cap (0 = unlimited)")
+    parser.add_argument('--min-df', type=int, help="Minimum document frequency of a vectorizer term")
+    parser.add_argument('--diff-against', metavar='PREVIOUS_OUTPUT',
+                        help="Previous run export to diff this run's matches against")
+    parser.add_argument('--out-of-core', action='store_true',
+                        help="Spill scored blocks to disk and merge them into the CSV output "
+                             "instead of holding all matches in memory")
+    parser.add_argument('--spill-dir', help="Directory for spilled match runs (default: a temp directory)")
+    parser.add_argument('--checkpoint-dir',
+                        help="Commit finished blocks here; rerunning the same command after a crash "
+                             "resumes from the last committed block")
+    parser.add_argument('--trends', metavar='CSV',
+                        help="Write monthly and rolling 12-month small-business shares of the input "
+                             "purchases (by Order Date) to this file")
+    parser.add_argument('--show-top', type=int, default=10, help="Number of top matches to print")
+    parser.add_argument('--quiet', action='store_true', help="Hide live throughput output")
+    return parser
+
+
+def print_progress(report: Dict):
+    """Live throughput line written to stderr"""
+    eta = report['eta_seconds']
+    sys.stderr.write(
+        f"\r   {report['rows_done']:,}/{report['total_rows']:,} rows | "
+        f"{report['rows_per_second']:,.0f} rows/s | "
+        f"{report['pairs_per_second']:,.0f} pairs/s | "
+        f"ETA {'-' if eta is None else f'{eta:,.0f}s'}   "
+    )
+    if report['rows_done'] >= report['total_rows']:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def parse_ngram_range(value: str) -> Tuple[int, int]:
+    """'1-2' -> (1, 2)"""
+    try:
+        low, high = (int(part) for part in value.split('-'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected an n-gram range like 1-2, got {value!r}")
+    if not 1 <= low <= high:
+        raise argparse.ArgumentTypeError(f"Invalid n-gram range: {value}")
+    return low, high
+
+
+def vectorizer_overrides(args: argparse.Namespace) -> Dict:
+    """Vectorizer settings given on the command line"""
+    overrides = {}
+    if args.ngram_range:
+        overrides['ngram_range'] = args.ngram_range
+    if args.max_features is not None:
+        overrides['max_features'] = args.max_features or None
+    if args.min_df is not None:
+        overrides['min_df'] = args.min_df
+    return overrides
+
+
+def run_ngram_profile(args: argparse.Namespace, matcher: SupplierSimilarityMatcher,
+                      purchase_df: pd.DataFrame, small_biz_df: pd.DataFrame) -> int:
+    """Sweep vectorizer configurations on the input data and print the cheapest acceptable one"""
+    purchase_texts = purchase_df['processed_description'].tolist()
+    registry_texts = small_biz_df['processed_keywords'].tolist()
+    print(f"Profiling vectorizer configurations on {len(purchase_texts)} purchases...")
+    results = profile_ngram_configs(purchase_texts, registry_texts, matcher.vectorizer.get_params(),
+                                    chunk_size=args.chunk_size, trace_memory=args.ngram_memory)
+    print(results.to_string(index=False))
     
-    # Load purchase data
-    print("Loading purchase data...")
-    purchase_df = matcher.load_purchase_data("slo purchases data.csv")
-    print(f"Loaded {len(purchase_df)} purchase records")
+    suggestion = suggest_config(results, args.ngram_tolerance)
+    max_features = suggestion['max_features']
+    print(f"\nSmallest configuration within {args.ngram_tolerance:.0%} top-k agreement loss "
+          f"(agreement {suggestion['topk_agreement']:.4f}, nnz {suggestion['nnz']:,}):")
+    print(f"   --ngram-range {suggestion['ngram_range']} "
+          f"--max-features {0 if pd.isna(max_features) else int(max_features)} --min-df {suggestion['min_df']}")
     
-    # Create small business data (replace with real data later)
-    print("Loading small business data...")
-    small_biz_df = matcher.create_small_business_data()
-    print(f"Loaded {len(small_biz_df)} small businesses")
+    if args.output:
+        report_path = Path(args.output).with_name(Path(args.output).stem + ".ngram_profile.csv")
+        results.to_csv(report_path, index=False)
+        print(f"Profile written to {report_path}")
+    return EXIT_OK
+
+
+def write_trends(trends: TrendTracker, path: str):
+    """Save the trend table and print the latest month"""
+    if not len(trends):
+        print(f"No {ORDER_DATE_COLUMN} column in the input; no trends written")
+        return
+    trends.table().to_csv(path, index=False)
+    latest = trends.latest()
+    print(f"Trends for {len(trends)} months written to {path} ({trends.undated} purchases without a date)")
+    print(f"   {latest['period']}: {latest['small_business_percentage']:.1f}% of POs to small businesses "
+          f"({latest['percentage_change']:+.1f} pts month over month), "
+          f"{latest[f'small_business_percentage_rolling_{trends.window}m']:.1f}% over the last {trends.window} months")
+
+
+def run_evaluation(args: argparse.Namespace, purchase_df: pd.DataFrame, small_biz_df: pd.DataFrame) -> int:
+    """Evaluate every configured matcher mode and print one comparison table"""
+    labeled_pairs = pd.read_csv(args.evaluate)
+    for col in ['PurchaseRow', 'SmallBusinessName']:
+        if col not in labeled_pairs.columns:
+            raise SchemaError(f"Missing required column in {args.evaluate}: {col}")
     
-    # Find matches
-    print("Finding similarity matches...")
-    matches = matcher.find_matches(purchase_df, small_biz_df)
+    def factory(options: Dict) -> Callable[[], SupplierSimilarityMatcher]:
+        def build() -> SupplierSimilarityMatcher:
+            matcher = SupplierSimilarityMatcher(similarity_threshold=args.threshold, **options)
+            if args.model:
+                matcher.load_model(args.model)
+            return matcher
+        return build
     
-    # Export results
-    matcher.export_results(matches, "supplier_matches.csv")
+    print(f"Evaluating {len(MATCHER_MODES)} matcher modes...")
+    modes = {name: factory(options) for name, options in MATCHER_MODES.items()}
+    results = evaluate_modes(modes, purchase_df, small_biz_df, labeled_pairs)
+    print(results.to_string(index=False))
     
-    # Show top 10 matches
-    print(f"\nTop 10 matches:")
-    for i, match in enumerate(matches[:10]):
+    if args.output:
+        report_path = Path(args.output).with_name(Path(args.output).stem + ".evaluation.csv")
+        results.to_csv(report_path, index=False)
+        print(f"Evaluation written to {report_path}")
+    return EXIT_OK
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Main execution function"""
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.add_businesses and not args.model:
+        parser.error("--add-businesses requires --model")
+    if args.shards and args.blocking:
+        parser.error("--shards cannot be combined with --blocking")
+    if args.shards and args.score_cache:
+        parser.error("--shards cannot be combined with --score-cache")
+    output_format = args.format or Path(args.output).suffix.lstrip('.').lower() or 'csv'
+    if output_format not in OUTPUT_FORMATS:
+        parser.error(f"unsupported output format '{output_format}'; use --format {{{','.join(OUTPUT_FORMATS)}}}")
+    if output_format == 'parquet' and not any(importlib.util.find_spec(engine) for engine in PARQUET_ENGINES):
+        parser.error("parquet output needs pyarrow (pip install pyarrow)")
+    if args.out_of_core:
+        if output_format != 'csv':
+            parser.error("--out-of-core writes CSV output only")
+        if args.business_index:
+            parser.error("--business-index needs the in-memory scores; drop --out-of-core")
+    matcher = SupplierSimilarityMatcher(
+        similarity_threshold=args.threshold,
+        top_k=args.top_k,
+        chunk_size=args.chunk_size,
+        n_jobs=args.workers,
+        scoring=args.scoring,
+        bm25_k1=args.bm25_k1,
+        bm25_b=args.bm25_b,
+        synonyms=SynonymNormalizer.from_csv(args.synonyms) if args.synonyms and not args.no_synonyms else None,
+        expand_synonyms=args.expand_synonyms and not args.no_synonyms,
+        blocking=args.blocking,
+        small_business_prefilter=args.small_business,
+        score_cache=ScoreCache(
+            args.score_cache, max_descriptions=args.cache_max_descriptions,
+            ttl_seconds=args.cache_ttl_days * 86400 if args.cache_ttl_days else None
+        ) if args.score_cache else None,
+        shards=args.shards,
+        shard_by=args.shard_by,
+        vectorizer_params=vectorizer_overrides(args)
+    )
+    
+    try:
+        if args.model:
+            print(f"Loading model from {args.model}...")
+            matcher.load_model(args.model)
+            if args.add_businesses:
+                summary = matcher.add_businesses(matcher.load_small_business_data(args.add_businesses))
+                print(f"Added {summary['added']} businesses (IDF drift {summary['idf_drift']:.4f}, "
+                      f"re-weighted: {summary['reweighted']})")
+        
+        # Load purchase data
+        print("Loading purchase data...")
+        frames = [matcher.load_purchase_data(path) for path in args.inputs]
+        purchase_df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        print(f"Loaded {len(purchase_df)} purchase records")
+        if args.trends:
+            write_trends(matcher.trends, args.trends)
+        if args.small_business:
+            skipped = int(matcher.profiler.counters.get('small_business_purchases', 0))
+            action = "dropped" if args.small_business == 'drop' else "flagged and not scored"
+            print(f"{skipped} purchases already with a small business {action}")
+        
+        # Load small business data (model registry, registry file or built-in sample)
+        print("Loading small business data...")
+        if args.registry:
+            small_biz_df = matcher.load_small_business_data(args.registry)
+        elif matcher.is_frozen:
+            small_biz_df = None
+        else:
+            small_biz_df = matcher.create_small_business_data()
+        registry_size = len(small_biz_df) if small_biz_df is not None else len(matcher.registry_df)
+        print(f"Loaded {registry_size} small businesses")
+        
+        if args.evaluate:
+            return run_evaluation(args, purchase_df, small_biz_df if small_biz_df is not None else matcher.registry_df)
+        if args.profile_ngrams:
+            return run_ngram_profile(
+                args, matcher, purchase_df, small_biz_df if small_biz_df is not None else matcher.registry_df
+            )
+        
+        # Find matches; Ctrl-C stops scoring at the next block instead of killing the process
+        print("Finding similarity matches...")
+        cancel = CancellationToken()
+        checkpoint = RunCheckpoint(args.checkpoint_dir) if args.checkpoint_dir else None
+        signal.signal(signal.SIGINT, lambda signum, frame: cancel.cancel("interrupted"))
+        if args.out_of_core:
+            summary = matcher.find_matches_to_file(
+                purchase_df, args.output, small_biz_df, spill_dir=args.spill_dir,
+                progress=None if args.quiet else print_progress, cancel=cancel, checkpoint=checkpoint
+            )
+            matches = pd.read_csv(args.output, nrows=args.show_top).to_dict('records') if args.show_top > 0 else []
+        else:
+            matches = matcher.find_matches(
+                purchase_df, small_biz_df, progress=None if args.quiet else print_progress,
+                cancel=cancel, checkpoint=checkpoint
+            )
+        if checkpoint is not None:
+            print(f"Checkpoint {args.checkpoint_dir}: resumed "
+                  f"{matcher.profiler.metadata['checkpoint']['resumed_batches']} committed blocks")
+        if matcher.score_cache is not None and matcher.score_cache.last_stats:  # empty when fully resumed
+            stats = matcher.score_cache.last_stats
+            print(f"Score cache: {stats['pairs_cached']:,} pairs cached, {stats['pairs_computed']:,} computed "
+                  f"(hit ratio {stats['hit_ratio']})")
+        
+        if args.save_model:
+            matcher.save_model(args.save_model)
+            print(f"Model saved to {args.save_model}")
+        
+        if args.business_index:
+            matcher.build_business_index(purchase_df, top_n=args.index_top_n).save(args.business_index)
+            print(f"Business index written to {args.business_index}")
+        
+        # Export results
+        if args.out_of_core:
+            print(f"Exported {summary['Total']} matches to {args.output} "
+                  f"({matcher.profiler.metadata['spill']['runs']} spilled runs)")
+            matcher.write_run_report(args.output)
+            matcher.print_match_summary(summary)
+        else:
+            matcher.export_results(matches, args.output, output_format=args.format)
+        
+        if args.diff_against:
+            diff = diff_runs(args.diff_against, args.output)
+            paths = diff.save(Path(args.output).with_suffix(''))
+            summary = diff.summary()
+            print(f"Changes since {args.diff_against}: {summary['added']} added, {summary['removed']} removed, "
+                  f"{summary['changed']} re-scored ({paths['summary']})")
+    except MatchCancelled as e:
+        print(f"\nMatching stopped ({e}); no output written", file=sys.stderr)
+        return EXIT_CANCELLED
+    except SchemaError as e:
+        print(f"Schema error: {e}", file=sys.stderr)
+        return EXIT_SCHEMA_ERROR
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    
+    # Show top matches
+    if args.show_top > 0:
+        print(f"\nTop {args.show_top} matches:")
+    for i, match in enumerate(matches[:args.show_top]):
         print(f"{i+1}. {match['SmallBusinessName']} -> {match['CurrentSupplier']}")
         print(f"   Score: {match['SimilarityScore']}, Amount: ${match['PurchaseAmount']:,.2f}")
-        print(f"   Description: {match['LineDescription'][:100]}...")
+        print(f"   Description: {str(match['LineDescription'])[:100]}...")
         print()
+    
+    # Show where the time went
+    print("Stage timings:")
+    for stage in matcher.get_run_report()['stages']:
+        print(f"   {stage['stage']:<18} {stage['wall_seconds']:>9.3f}s wall {stage['cpu_seconds']:>9.3f}s cpu")
+    
+    return EXIT_OK
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
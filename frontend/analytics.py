@@ -1,33 +1,35 @@
+import sys
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional
+
+sys.path.append(str(Path(__file__).parent.parent))  # project root, for the shared backend data layer
+
+from backend.data_access import load_dataset
+from backend.matching.trends import DEFAULT_WINDOW, TrendTracker
+from plan_optimizer import CapacitySpec, optimize_capacity_assignment, optimize_spend_target
+from what_if import ALL_MATCHES, DEFAULT_PHASE_EDGES, DEFAULT_TARGETS, WhatIfEngine
 
 class POQuantityAnalytics:
     def __init__(self):
         self.backend_dir = Path(__file__).parent.parent / "backend"
         self.target_percentage = 25.0  # 25% of POs should go to small businesses
+        self._what_if = None  # (matches frame, stats, engine) of the last what-if build
+        self._trends = None  # (test results frame, window, tracker) of the last trend build
         
+    # Frames come from the process-wide cache shared with the chatbot: read-only
     def load_test_results(self) -> pd.DataFrame:
         """Load the full test results data"""
-        try:
-            return pd.read_csv(self.backend_dir / "test_results.csv")
-        except FileNotFoundError:
-            return pd.DataFrame()
+        return load_dataset('test_results', self.backend_dir)
     
     def load_detailed_analysis(self) -> pd.DataFrame:
         """Load detailed similarity analysis"""
-        try:
-            return pd.read_csv(self.backend_dir / "detailed_similarity_analysis.csv")
-        except FileNotFoundError:
-            return pd.DataFrame()
+        return load_dataset('detailed_analysis', self.backend_dir)
     
     def load_small_business_contacts(self) -> pd.DataFrame:
         """Load small business contact information"""
-        try:
-            return pd.read_csv(self.backend_dir / "small_business_contacts.csv")
-        except FileNotFoundError:
-            return pd.DataFrame()
+        return load_dataset('small_business_contacts', self.backend_dir)
     
     def calculate_current_po_percentage(self) -> Dict:
         """Calculate current small business PO percentage (by quantity, not amount)"""
@@ -39,15 +41,15 @@ class POQuantityAnalytics:
         # Each row represents a PO/purchase transaction
         total_pos = len(test_results)
         
-        # Identify current small businesses (those marked as OSB, SB, etc.)
-        small_business_indicators = ['OSB', 'SB', 'SMALL', 'MINORITY', 'WOMEN', 'DIVERSE']
-        test_results['IsCurrentSmallBusiness'] = test_results['CurrentSupplierType'].fillna('').str.upper().apply(
-            lambda x: any(indicator in str(x) for indicator in small_business_indicators)
-        )
-        
-        current_small_business_pos = test_results['IsCurrentSmallBusiness'].sum()
+        # Current small businesses (OSB, SB, etc.), flagged once when the data was loaded
+        current_small_business_pos = int(test_results['IsCurrentSmallBusiness'].sum())
         current_percentage = (current_small_business_pos / total_pos * 100) if total_pos > 0 else 0
         
+        # The same split by dollars, for spend-weighted plans
+        amounts = test_results['PurchaseAmount'].fillna(0) if 'PurchaseAmount' in test_results.columns else pd.Series(0.0, index=test_results.index)
+        total_spend = float(amounts.sum())
+        current_small_business_spend = float(amounts[test_results['IsCurrentSmallBusiness']].sum())
+        
         # Calculate gap
         target_pos_needed = int(total_pos * self.target_percentage / 100)
         gap_pos_needed = target_pos_needed - current_small_business_pos
@@ -61,65 +63,77 @@ class POQuantityAnalytics:
             'target_pos_needed': target_pos_needed,
             'gap_pos_needed': max(0, gap_pos_needed),
             'gap_percentage': max(0, gap_percentage),
-            'current_non_small_business_pos': total_pos - current_small_business_pos
+            'current_non_small_business_pos': total_pos - current_small_business_pos,
+            'total_spend': total_spend,
+            'current_small_business_spend': current_small_business_spend,
+            'current_spend_percentage': (current_small_business_spend / total_spend * 100) if total_spend > 0 else 0
         }
     
-    def generate_po_optimization_plan(self) -> Dict:
-        """Generate optimization plan to reach 25% of POs going to small businesses"""
+    def what_if_engine(self) -> Optional[WhatIfEngine]:
+        """Scenario engine over the current matches, rebuilt only when the data changes"""
         current_stats = self.calculate_current_po_percentage()
         detailed_analysis = self.load_detailed_analysis()
-        
         if detailed_analysis.empty or 'error' in current_stats:
+            return None
+        
+        stats_key = (current_stats['current_small_business_pos'], current_stats['total_pos'])
+        if self._what_if is None or self._what_if[0] is not detailed_analysis or self._what_if[1] != stats_key:
+            engine = WhatIfEngine(detailed_analysis, *stats_key)
+            self._what_if = (detailed_analysis, stats_key, engine)
+        return self._what_if[2]
+    
+    def compare_targets(self, targets=DEFAULT_TARGETS, thresholds=(0.4, 0.2, ALL_MATCHES)) -> Dict:
+        """Side-by-side what-if scenarios for every (target %, similarity threshold) pair"""
+        engine = self.what_if_engine()
+        if engine is None:
+            return {"error": "Insufficient data for what-if scenarios"}
+        
+        grid = engine.evaluate_grid(targets, thresholds)
+        grid['threshold'] = grid['threshold'].astype(object).where(np.isfinite(grid['threshold']), None)
+        return {
+            'scenarios': grid.to_dict('records'),
+            'total_potential_transitions': len(engine)
+        }
+    
+    def generate_po_optimization_plan(self, business_capacity: Optional[CapacitySpec] = None,
+                                      capacity_by: str = 'count', phase_edges=DEFAULT_PHASE_EDGES,
+                                      phase_weight: str = 'count') -> Dict:
+        """Generate optimization plan to reach 25% of POs going to small businesses
+        
+        If business_capacity is given (max POs, or dollars with capacity_by='amount',
+        either one value for all businesses or a dict per business), the optimal
+        path respects it instead of taking the top matches regardless of who they go to.
+        Implementation phases are similarity bins starting at phase_edges; with
+        phase_weight='amount' their progress is measured in spend instead of POs.
+        """
+        if phase_weight not in ('count', 'amount'):
+            raise ValueError(f"phase_weight must be 'count' or 'amount', not {phase_weight!r}")
+        current_stats = self.calculate_current_po_percentage()
+        engine = self.what_if_engine()
+        
+        if engine is None:
             return {"error": "Insufficient data for optimization plan"}
         
-        # Sort matches by similarity score (best matches first)
-        detailed_analysis = detailed_analysis.sort_values('Similarity_Score', ascending=False)
+        # Matches sorted by similarity score once (best matches first)
+        detailed_analysis = engine.sorted_matches
         
         # Each match represents a potential PO transition
         total_potential_transitions = len(detailed_analysis)
         
-        # Calculate scenarios based on similarity thresholds
+        # Scenarios based on similarity thresholds: every match at or above the threshold
         scenarios = {}
-        
-        # High Confidence Scenario (>= 0.4 similarity)
-        high_confidence = detailed_analysis[detailed_analysis['Similarity_Score'] >= 0.4]
-        high_conf_pos = len(high_confidence)
-        high_conf_new_percentage = ((current_stats['current_small_business_pos'] + high_conf_pos) / 
-                                   current_stats['total_pos'] * 100)
-        
-        scenarios['high_confidence'] = {
-            'threshold': '>= 0.4',
-            'pos_to_transition': high_conf_pos,
-            'resulting_small_business_pos': current_stats['current_small_business_pos'] + high_conf_pos,
-            'resulting_percentage': high_conf_new_percentage,
-            'target_achieved': high_conf_new_percentage >= self.target_percentage
-        }
-        
-        # Medium Confidence Scenario (>= 0.2 similarity)
-        medium_confidence = detailed_analysis[detailed_analysis['Similarity_Score'] >= 0.2]
-        medium_conf_pos = len(medium_confidence)
-        medium_conf_new_percentage = ((current_stats['current_small_business_pos'] + medium_conf_pos) / 
-                                     current_stats['total_pos'] * 100)
-        
-        scenarios['medium_confidence'] = {
-            'threshold': '>= 0.2',
-            'pos_to_transition': medium_conf_pos,
-            'resulting_small_business_pos': current_stats['current_small_business_pos'] + medium_conf_pos,
-            'resulting_percentage': medium_conf_new_percentage,
-            'target_achieved': medium_conf_new_percentage >= self.target_percentage
-        }
-        
-        # All Matches Scenario
-        all_matches_new_percentage = ((current_stats['current_small_business_pos'] + total_potential_transitions) / 
-                                     current_stats['total_pos'] * 100)
-        
-        scenarios['all_matches'] = {
-            'threshold': 'All matches',
-            'pos_to_transition': total_potential_transitions,
-            'resulting_small_business_pos': current_stats['current_small_business_pos'] + total_potential_transitions,
-            'resulting_percentage': all_matches_new_percentage,
-            'target_achieved': all_matches_new_percentage >= self.target_percentage
-        }
+        for name, threshold, label in [('high_confidence', 0.4, '>= 0.4'),
+                                       ('medium_confidence', 0.2, '>= 0.2'),
+                                       ('all_matches', ALL_MATCHES, 'All matches')]:
+            summary = engine.threshold_summary(threshold)
+            scenarios[name] = {
+                'threshold': label,
+                'pos_to_transition': summary['pos_to_transition'],
+                'resulting_small_business_pos': summary['resulting_small_business_pos'],
+                'resulting_percentage': summary['resulting_percentage'],
+                'target_achieved': summary['resulting_percentage'] >= self.target_percentage
+            }
+        all_matches_new_percentage = scenarios['all_matches']['resulting_percentage']
         
         # Find optimal path to exactly 25%
         pos_needed_for_target = current_stats['gap_pos_needed']
@@ -131,9 +145,36 @@ class POQuantityAnalytics:
                 'target_achieved': True,
                 'message': 'Target already achieved'
             }
+        elif business_capacity is not None:
+            # Spread transitions across businesses without exceeding their capacity
+            assignment = optimize_capacity_assignment(
+                detailed_analysis,
+                capacity=business_capacity,
+                pos_needed=pos_needed_for_target,
+                capacity_by=capacity_by
+            )
+            optimal_matches = assignment['plan']
+            resulting_percentage = ((current_stats['current_small_business_pos'] + assignment['pos_assigned']) /
+                                    current_stats['total_pos'] * 100)
+            optimal_path = {
+                'pos_to_transition': assignment['pos_assigned'],
+                'resulting_percentage': resulting_percentage,
+                'target_achieved': assignment['unmet_pos'] == 0,
+                'top_recommendations': optimal_matches.head(10).to_dict('records'),
+                'avg_similarity_score': assignment['avg_similarity_score'],
+                'total_similarity': assignment['total_similarity'],
+                'capacity_by': capacity_by,
+                'shortfall': assignment['unmet_pos'],
+                'unmet_gap_percentage': max(0, self.target_percentage - resulting_percentage),
+                'business_utilization': assignment['business_utilization'],
+                'saturated_businesses': assignment['saturated_businesses']
+            }
+            if assignment['unmet_pos'] > 0:
+                optimal_path['message'] = (f"Business capacity limits transitions to {assignment['pos_assigned']} "
+                                           f"of the {pos_needed_for_target} POs needed")
         elif pos_needed_for_target <= total_potential_transitions:
             # We can achieve exactly 25% with available matches
-            optimal_matches = detailed_analysis.head(pos_needed_for_target)
+            optimal_matches = engine.top_matches(pos_needed_for_target)
             optimal_path = {
                 'pos_to_transition': pos_needed_for_target,
                 'resulting_percentage': self.target_percentage,
@@ -151,32 +192,36 @@ class POQuantityAnalytics:
                 'shortfall': pos_needed_for_target - total_potential_transitions
             }
         
-        # Create implementation phases
+        # Create implementation phases: disjoint similarity bins, best first
         implementation_phases = []
         cumulative_pos = 0
-        
-        for threshold in [0.6, 0.4, 0.3, 0.2, 0.1]:
-            phase_matches = detailed_analysis[
-                (detailed_analysis['Similarity_Score'] >= threshold) & 
-                (detailed_analysis['Similarity_Score'] < threshold + 0.2 if threshold < 0.6 else True)
-            ]
-            
-            if len(phase_matches) > 0:
-                cumulative_pos += len(phase_matches)
+        cumulative_spend = 0.0
+        
+        for phase in engine.phase_table(phase_edges).itertuples(index=False):
+            if phase.pos_in_phase == 0:
+                continue
+            cumulative_pos += int(phase.pos_in_phase)
+            cumulative_spend += float(phase.spend_in_phase)
+            if phase_weight == 'amount':
+                new_percentage = ((current_stats['current_small_business_spend'] + cumulative_spend) /
+                                  current_stats['total_spend'] * 100) if current_stats['total_spend'] > 0 else 0
+            else:
                 new_percentage = ((current_stats['current_small_business_pos'] + cumulative_pos) / 
-                                current_stats['total_pos'] * 100)
-                
-                implementation_phases.append({
-                    'phase': f"Phase {len(implementation_phases) + 1}",
-                    'similarity_threshold': f">= {threshold:.1f}",
-                    'pos_in_phase': len(phase_matches),
-                    'cumulative_pos': cumulative_pos,
-                    'resulting_percentage': new_percentage,
-                    'target_achieved': new_percentage >= self.target_percentage
-                })
-                
-                if new_percentage >= self.target_percentage:
-                    break
+                                  current_stats['total_pos'] * 100)
+            
+            implementation_phases.append({
+                'phase': f"Phase {len(implementation_phases) + 1}",
+                'similarity_threshold': f">= {phase.lower:g}",
+                'pos_in_phase': int(phase.pos_in_phase),
+                'cumulative_pos': cumulative_pos,
+                'spend_in_phase': float(phase.spend_in_phase),
+                'cumulative_spend': cumulative_spend,
+                'resulting_percentage': new_percentage,
+                'target_achieved': new_percentage >= self.target_percentage
+            })
+            
+            if new_percentage >= self.target_percentage:
+                break
         
         return {
             'current_stats': current_stats,
@@ -186,6 +231,84 @@ class POQuantityAnalytics:
             'total_potential_transitions': total_potential_transitions
         }
     
+    def generate_spend_optimization_plan(self, target_percentage: Optional[float] = None,
+                                         target_spend: Optional[float] = None) -> Dict:
+        """Optimal path to a share of spend (dollars) going to small businesses, not a share of POs
+        
+        The target is target_spend dollars of small business spend, or
+        target_percentage (default: the PO target) of total spend. The result
+        has the same shape as the PO plan's optimal_path plus spend figures.
+        """
+        current_stats = self.calculate_current_po_percentage()
+        engine = self.what_if_engine()
+        
+        if engine is None:
+            return {"error": "Insufficient data for spend optimization"}
+        
+        total_spend = current_stats['total_spend']
+        current_spend = current_stats['current_small_business_spend']
+        if target_spend is None:
+            target_percentage = self.target_percentage if target_percentage is None else target_percentage
+            target_spend = total_spend * target_percentage / 100
+        else:
+            target_percentage = target_spend / total_spend * 100 if total_spend > 0 else 0
+        spend_needed = target_spend - current_spend
+        
+        if spend_needed <= 0:
+            return {
+                'pos_to_transition': 0,
+                'resulting_percentage': current_stats['current_spend_percentage'],
+                'target_percentage': target_percentage,
+                'target_achieved': True,
+                'message': 'Target already achieved'
+            }
+        
+        assignment = optimize_spend_target(engine.sorted_matches, spend_needed)
+        resulting_percentage = ((current_spend + assignment['spend_assigned']) / total_spend * 100) if total_spend > 0 else 0
+        optimal_path = {
+            'pos_to_transition': assignment['pos_assigned'],
+            'resulting_percentage': resulting_percentage,
+            'target_percentage': target_percentage,
+            'target_achieved': assignment['unmet_spend'] == 0,
+            'top_recommendations': assignment['plan'].head(10).to_dict('records'),
+            'avg_similarity_score': assignment['avg_similarity_score'],
+            'spend_needed': spend_needed,
+            'spend_to_transition': assignment['spend_assigned']
+        }
+        if assignment['unmet_spend'] > 0:
+            optimal_path['spend_shortfall'] = assignment['unmet_spend']
+            optimal_path['message'] = (f"Need ${spend_needed:,.0f} of spend but all matches only cover "
+                                       f"${assignment['spend_assigned']:,.0f}")
+        return optimal_path
+    
+    def trend_tracker(self, window: int = DEFAULT_WINDOW) -> Optional[TrendTracker]:
+        """Monthly and rolling PO aggregates by order date, rebuilt only when the data changes"""
+        test_results = self.load_test_results()
+        if test_results.empty or 'OrderDate' not in test_results.columns:
+            return None
+        
+        if self._trends is None or self._trends[0] is not test_results or self._trends[1] != window:
+            tracker = TrendTracker(window)
+            tracker.add(test_results['OrderDate'], test_results['IsCurrentSmallBusiness'],
+                        test_results['PurchaseAmount'] if 'PurchaseAmount' in test_results.columns else None)
+            self._trends = (test_results, window, tracker)
+        return self._trends[2]
+    
+    def get_po_trends(self, window: int = DEFAULT_WINDOW) -> Dict:
+        """Month-over-month small business PO percentage and rolling windows"""
+        tracker = self.trend_tracker(window)
+        if tracker is None or not len(tracker):
+            return {"error": "No order dates in the test results"}
+        
+        table = tracker.table()
+        table = table.astype(object).where(table.notna(), None)
+        return {
+            'months': table.to_dict('records'),
+            'latest': table.iloc[-1].to_dict(),
+            'window_months': window,
+            'undated_pos': tracker.undated
+        }
+    
     def get_supplier_transition_analysis(self) -> Dict:
         """Analyze which current suppliers would need to be replaced"""
         detailed_analysis = self.load_detailed_analysis()
@@ -251,7 +374,9 @@ class POQuantityAnalytics:
         
         # Calculate how many POs each current supplier has
         supplier_po_counts = detailed_analysis.groupby('Current_Supplier').size().to_dict()
-        detailed_analysis['Supplier_PO_Count'] = detailed_analysis['Current_Supplier'].map(supplier_po_counts)
+        detailed_analysis = detailed_analysis.assign(
+            Supplier_PO_Count=detailed_analysis['Current_Supplier'].map(supplier_po_counts)
+        )
         
         # Create impact score: 70% similarity, 30% supplier PO volume (normalized)
         max_po_count = detailed_analysis['Supplier_PO_Count'].max()
@@ -1,26 +1,26 @@
+import sys
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from typing import Dict, List, Tuple
 
+sys.path.append(str(Path(__file__).parent.parent))  # project root, for the shared backend data layer
+
+from backend.data_access import load_dataset
+
 class POQuantityAnalytics:
     def __init__(self):
         self.backend_dir = Path(__file__).parent.parent / "backend"
         self.target_percentage = 25.0  # 25% of POs should go to small businesses
         
+    # Frames come from the process-wide cache shared with the chatbot: read-only
     def load_test_results(self) -> pd.DataFrame:
         """Load the full test results data"""
-        try:
-            return pd.read_csv(self.backend_dir / "test_results.csv")
-        except FileNotFoundError:
-            return pd.DataFrame()
+        return load_dataset('test_results', self.backend_dir)
     
     def load_detailed_analysis(self) -> pd.DataFrame:
         """Load detailed similarity analysis"""
-        try:
-            return pd.read_csv(self.backend_dir / "detailed_similarity_analysis.csv")
-        except FileNotFoundError:
-            return pd.DataFrame()
+        return load_dataset('detailed_analysis', self.backend_dir)
     
     def calculate_current_po_percentage(self) -> Dict:
         """Calculate current small business PO percentage (by quantity, not amount)"""
@@ -32,13 +32,8 @@ class POQuantityAnalytics:
         # Each row represents a PO/purchase transaction
         total_pos = len(test_results)
         
-        # Identify current small businesses (those marked as OSB, SB, etc.)
-        small_business_indicators = ['OSB', 'SB', 'SMALL', 'MINORITY', 'WOMEN', 'DIVERSE']
-        test_results['IsCurrentSmallBusiness'] = test_results['CurrentSupplierType'].fillna('').str.upper().apply(
-            lambda x: any(indicator in str(x) for indicator in small_business_indicators)
-        )
-        
-        current_small_business_pos = test_results['IsCurrentSmallBusiness'].sum()
+        # Current small businesses (OSB, SB, etc.), flagged once when the data was loaded
+        current_small_business_pos = int(test_results['IsCurrentSmallBusiness'].sum())
         current_percentage = (current_small_business_pos / total_pos * 100) if total_pos > 0 else 0
         
         # Calculate gap
@@ -243,7 +238,9 @@ class POQuantityAnalytics:
         
         # Calculate how many POs each current supplier has
         supplier_po_counts = detailed_analysis.groupby('Current_Supplier').size().to_dict()
-        detailed_analysis['Supplier_PO_Count'] = detailed_analysis['Current_Supplier'].map(supplier_po_counts)
+        detailed_analysis = detailed_analysis.assign(
+            Supplier_PO_Count=detailed_analysis['Current_Supplier'].map(supplier_po_counts)
+        )
         
         # Create impact score: 70% similarity, 30% supplier PO volume (normalized)
         max_po_count = detailed_analysis['Supplier_PO_Count'].max()
@@ -0,0 +1,203 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, Optional, Union
+
+CapacitySpec = Union[float, Dict[str, float]]
+
+
+def _capacity_array(businesses: np.ndarray, capacity: CapacitySpec,
+                    default_capacity: Optional[float]) -> np.ndarray:
+    """Capacity per business code; a scalar applies to every business"""
+    if isinstance(capacity, dict):
+        fallback = np.inf if default_capacity is None else default_capacity
+        return np.array([capacity.get(name, fallback) for name in businesses], dtype=float)
+    return np.full(len(businesses), float(capacity))
+
+
+def optimize_capacity_assignment(matches: pd.DataFrame,
+                                 capacity: CapacitySpec,
+                                 pos_needed: Optional[int] = None,
+                                 capacity_by: str = 'count',
+                                 default_capacity: Optional[float] = None,
+                                 business_column: str = 'Small_Business',
+                                 score_column: str = 'Similarity_Score',
+                                 amount_column: str = 'Purchase_Amount',
+                                 po_column: Optional[str] = None) -> Dict:
+    """Assign POs to small businesses by best similarity without exceeding business capacity
+
+    Candidate pairs are swept in descending score order (the order a max-heap
+    would pop them). A pair is taken when its PO is still unassigned and the
+    business has capacity left, either a number of POs (capacity_by='count')
+    or dollars (capacity_by='amount'). Each row is its own PO unless
+    po_column identifies rows that compete for the same PO.
+    """
+    if capacity_by not in ('count', 'amount'):
+        raise ValueError(f"capacity_by must be 'count' or 'amount', not {capacity_by!r}")
+
+    empty_result = {
+        'plan': matches.iloc[0:0],
+        'pos_assigned': 0,
+        'pos_needed': pos_needed or 0,
+        'unmet_pos': pos_needed or 0,
+        'total_similarity': 0.0,
+        'avg_similarity_score': 0.0,
+        'total_amount': 0.0,
+        'business_utilization': [],
+        'saturated_businesses': []
+    }
+    if matches.empty:
+        return empty_result
+
+    scores = matches[score_column].to_numpy(dtype=float)
+    business_codes, businesses = pd.factorize(matches[business_column])
+    if po_column is not None:
+        po_codes, _ = pd.factorize(matches[po_column])
+        po_count = int(po_codes.max()) + 1
+    else:
+        po_codes = np.arange(len(matches))
+        po_count = len(matches)
+
+    if capacity_by == 'amount':
+        weights = matches[amount_column].abs().to_numpy(dtype=float)
+    else:
+        weights = np.ones(len(matches))
+
+    capacities = _capacity_array(np.asarray(businesses), capacity, default_capacity)
+    limit = len(matches) if pos_needed is None else int(pos_needed)
+
+    # Best pairs first; a stable sort keeps the input order for equal scores
+    order = np.argsort(-scores, kind='stable')
+    selected = []
+
+    # Plain lists iterate far faster than per-element numpy indexing
+    order_list = order.tolist()
+    business_list = business_codes.tolist()
+    po_list = po_codes.tolist()
+    weight_list = weights.tolist()
+    remaining_list = capacities.tolist()
+    taken = [False] * po_count
+
+    for idx in order_list:
+        if len(selected) >= limit:
+            break
+        po = po_list[idx]
+        if taken[po]:
+            continue
+        business = business_list[idx]
+        weight = weight_list[idx]
+        if remaining_list[business] < weight:
+            continue
+        remaining_list[business] -= weight
+        taken[po] = True
+        selected.append(idx)
+
+    selected = np.asarray(selected, dtype=np.int64)
+    plan = matches.iloc[selected]
+    remaining = np.asarray(remaining_list)
+
+    used = capacities - remaining
+    utilization = pd.DataFrame({
+        business_column: np.asarray(businesses),
+        'Capacity': capacities,
+        'Used': used,
+        'Assigned_POs': np.bincount(business_codes[selected], minlength=len(businesses))
+    })
+    utilization['Utilization'] = np.where(
+        np.isfinite(capacities) & (capacities > 0), used / np.where(capacities > 0, capacities, 1), 0.0
+    )
+    utilization = utilization.sort_values('Assigned_POs', ascending=False)
+    # A business is saturated once it cannot take even its smallest candidate
+    min_weight = pd.Series(weights).groupby(business_codes).min().reindex(range(len(businesses))).to_numpy()
+    saturated = np.asarray(businesses)[remaining < min_weight]
+
+    total_similarity = float(scores[selected].sum())
+    pos_assigned = len(selected)
+    needed = pos_assigned if pos_needed is None else int(pos_needed)
+
+    return {
+        'plan': plan,
+        'pos_assigned': pos_assigned,
+        'pos_needed': needed,
+        'unmet_pos': max(0, needed - pos_assigned),
+        'total_similarity': total_similarity,
+        'avg_similarity_score': total_similarity / pos_assigned if pos_assigned else 0.0,
+        'total_amount': float(matches[amount_column].to_numpy()[selected].sum()) if amount_column in matches.columns else 0.0,
+        'business_utilization': utilization.to_dict('records'),
+        'saturated_businesses': saturated.tolist()
+    }
+
+
+def optimize_spend_target(matches: pd.DataFrame,
+                          spend_needed: float,
+                          score_column: str = 'Similarity_Score',
+                          amount_column: str = 'Purchase_Amount',
+                          po_column: Optional[str] = None) -> Dict:
+    """Greedily pick transitions whose spend reaches spend_needed at a high average similarity
+
+    Candidates are taken in descending score order (the order a max-heap
+    would pop them) until their spend covers the target, then the selection
+    is trimmed from its lowest score upward: a pair is dropped when it is
+    below the running average and the rest still covers the target. Only
+    positive amounts count towards the target, and each PO is taken once.
+    """
+    spend_needed = max(float(spend_needed), 0.0)
+    empty_result = {
+        'plan': matches.iloc[0:0],
+        'pos_assigned': 0,
+        'spend_needed': spend_needed,
+        'spend_assigned': 0.0,
+        'unmet_spend': spend_needed,
+        'total_similarity': 0.0,
+        'avg_similarity_score': 0.0
+    }
+    if matches.empty or spend_needed <= 0:
+        return empty_result
+
+    scores = matches[score_column].to_numpy(dtype=float)
+    amounts = matches[amount_column].fillna(0).to_numpy(dtype=float)
+
+    # Best pairs first, keeping only each PO's best pair with a positive amount
+    order = np.argsort(-scores, kind='stable')
+    order = order[amounts[order] > 0]
+    if po_column is not None:
+        po_codes, _ = pd.factorize(matches[po_column])
+        _, first = np.unique(po_codes[order], return_index=True)
+        order = order[np.sort(first)]
+    if len(order) == 0:
+        return empty_result
+
+    # Shortest best-first prefix whose spend covers the target
+    cumulative = np.cumsum(amounts[order])
+    cut = min(int(np.searchsorted(cumulative, spend_needed, side='left')) + 1, len(order))
+    selected = order[:cut]
+
+    # Drop low scorers the target does not need; each drop raises the average
+    surplus = float(cumulative[cut - 1]) - spend_needed
+    total_similarity = float(scores[selected].sum())
+    keep = np.ones(cut, dtype=bool)
+    kept = cut
+    if surplus > 0:
+        selected_scores = scores[selected].tolist()
+        selected_amounts = amounts[selected].tolist()
+        for i in range(cut - 1, -1, -1):
+            if kept == 1:
+                break
+            score = selected_scores[i]
+            amount = selected_amounts[i]
+            if amount <= surplus and score * kept < total_similarity:
+                surplus -= amount
+                total_similarity -= score
+                kept -= 1
+                keep[i] = False
+    selected = selected[keep]
+
+    spend_assigned = float(amounts[selected].sum())
+    return {
+        'plan': matches.iloc[selected],
+        'pos_assigned': kept,
+        'spend_needed': spend_needed,
+        'spend_assigned': spend_assigned,
+        'unmet_spend': max(0.0, spend_needed - spend_assigned),
+        'total_similarity': total_similarity,
+        'avg_similarity_score': total_similarity / kept if kept else 0.0
+    }
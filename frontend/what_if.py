@@ -0,0 +1,136 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, Optional, Sequence
+
+DEFAULT_TARGETS = (15.0, 20.0, 25.0, 30.0)
+ALL_MATCHES = -np.inf  # threshold that admits every match
+
+# Lower edges of the implementation phases; the top phase is open-ended
+DEFAULT_PHASE_EDGES = (0.1, 0.2, 0.3, 0.4, 0.6)
+
+
+class WhatIfEngine:
+    """Answers (target %, similarity threshold) scenarios over one sorted match set
+
+    Matches are sorted by descending similarity once and kept as cumulative
+    count, similarity and spend arrays; any scenario is then a binary search
+    for the threshold cut plus O(1) lookups, and a whole grid of scenarios is
+    one vectorized searchsorted.
+    """
+
+    def __init__(self, matches: pd.DataFrame, current_small_business_pos: int, total_pos: int,
+                 score_column: str = 'Similarity_Score', amount_column: str = 'Purchase_Amount'):
+        self.current_small_business_pos = int(current_small_business_pos)
+        self.total_pos = int(total_pos)
+        if matches.empty or score_column not in matches.columns:
+            matches = pd.DataFrame({score_column: pd.Series(dtype=float)})
+        matches = matches[matches[score_column].notna()]
+        # Same ordering as the optimization plan's best-first recommendations
+        self.sorted_matches = matches.sort_values(score_column, ascending=False)
+
+        scores = self.sorted_matches[score_column].to_numpy(dtype=float)
+        self._neg_scores = -scores  # ascending, for searchsorted
+        self._cum_score = np.concatenate([[0.0], np.cumsum(scores)])
+        if amount_column in self.sorted_matches.columns:
+            amounts = self.sorted_matches[amount_column].fillna(0).to_numpy(dtype=float)
+        else:
+            amounts = np.zeros(len(scores))
+        self._cum_spend = np.concatenate([[0.0], np.cumsum(amounts)])
+
+    def __len__(self) -> int:
+        return len(self._neg_scores)
+
+    def pos_needed(self, target_percentage):
+        """POs still needed to reach a target (0 once it is met); accepts arrays"""
+        target_pos = (self.total_pos * np.asarray(target_percentage, dtype=float) / 100).astype(np.int64)
+        return np.maximum(target_pos - self.current_small_business_pos, 0)
+
+    def available(self, threshold):
+        """Matches with similarity >= threshold; accepts arrays"""
+        return np.searchsorted(self._neg_scores, -np.asarray(threshold, dtype=float), side='right')
+
+    def evaluate_grid(self, targets: Sequence[float] = DEFAULT_TARGETS,
+                      thresholds: Sequence[float] = (ALL_MATCHES,)) -> pd.DataFrame:
+        """Every (target, threshold) combination in one vectorized pass, one row per scenario
+
+        A scenario transitions the best matches at or above its threshold, as
+        many as the target needs (or all of them when there are too few).
+        """
+        target_grid, threshold_grid = np.meshgrid(np.asarray(targets, dtype=float),
+                                                  np.asarray(thresholds, dtype=float), indexing='ij')
+        target_grid, threshold_grid = target_grid.ravel(), threshold_grid.ravel()
+
+        needed = self.pos_needed(target_grid)
+        available = self.available(threshold_grid)
+        transition = np.minimum(needed, available)
+        resulting_pos = self.current_small_business_pos + transition
+        resulting_percentage = resulting_pos / self.total_pos * 100 if self.total_pos else np.zeros(len(transition))
+        total_similarity = self._cum_score[transition]
+
+        return pd.DataFrame({
+            'target_percentage': target_grid,
+            'threshold': threshold_grid,
+            'pos_needed': needed,
+            'pos_available': available,
+            'pos_to_transition': transition,
+            'resulting_small_business_pos': resulting_pos,
+            'resulting_percentage': resulting_percentage,
+            'target_achieved': available >= needed,
+            'shortfall': needed - transition,
+            'avg_similarity_score': np.divide(total_similarity, transition,
+                                              out=np.zeros(len(transition)), where=transition > 0),
+            'spend_to_transition': self._cum_spend[transition]
+        })
+
+    def scenario(self, target_percentage: float, threshold: float = ALL_MATCHES) -> Dict:
+        """One (target, threshold) scenario; O(log n)"""
+        row = self.evaluate_grid([target_percentage], [threshold]).iloc[0]
+        return {
+            'target_percentage': float(row['target_percentage']),
+            'threshold': float(row['threshold']),
+            'pos_needed': int(row['pos_needed']),
+            'pos_available': int(row['pos_available']),
+            'pos_to_transition': int(row['pos_to_transition']),
+            'resulting_small_business_pos': int(row['resulting_small_business_pos']),
+            'resulting_percentage': float(row['resulting_percentage']),
+            'target_achieved': bool(row['target_achieved']),
+            'shortfall': int(row['shortfall']),
+            'avg_similarity_score': float(row['avg_similarity_score']),
+            'spend_to_transition': float(row['spend_to_transition'])
+        }
+
+    def threshold_summary(self, threshold: float = ALL_MATCHES) -> Dict:
+        """Transitioning every match at or above a threshold (the plan's fixed scenarios)"""
+        count = int(self.available(threshold))
+        resulting_pos = self.current_small_business_pos + count
+        return {
+            'pos_to_transition': count,
+            'resulting_small_business_pos': resulting_pos,
+            'resulting_percentage': resulting_pos / self.total_pos * 100 if self.total_pos else 0.0,
+            'spend_to_transition': float(self._cum_spend[count])
+        }
+
+    def phase_table(self, edges: Sequence[float] = DEFAULT_PHASE_EDGES) -> pd.DataFrame:
+        """Matches and spend per similarity bin, best bin first
+
+        Bins are [edge, next edge) with the highest one open-ended, so every
+        match at or above the lowest edge lands in exactly one phase. All bins
+        come from one searchsorted over the sorted scores.
+        """
+        lowers = np.unique(np.asarray(edges, dtype=float))[::-1]
+        uppers = np.r_[np.inf, lowers[:-1]]
+        at_least = self.available(lowers)
+        above = np.r_[0, at_least[:-1]]
+        return pd.DataFrame({
+            'lower': lowers,
+            'upper': uppers,
+            'pos_in_phase': at_least - above,
+            'spend_in_phase': self._cum_spend[at_least] - self._cum_spend[above],
+            'cumulative_pos': at_least,
+            'cumulative_spend': self._cum_spend[at_least]
+        })
+
+    def top_matches(self, count: int, limit: Optional[int] = None) -> pd.DataFrame:
+        """The best count matches (optionally only the first limit of them)"""
+        count = int(count) if limit is None else min(int(count), int(limit))
+        return self.sorted_matches.head(count)